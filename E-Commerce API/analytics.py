@@ -0,0 +1,169 @@
+#analytics.py
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func
+
+from models import DailySales, ProductSales, Order, OrderItem
+from database import engine
+
+def record_sale(session: Session, order: Order):
+    """Add an order to the rollup tables inside the checkout transaction"""
+    units = sum(item.quantity for item in order.items)
+
+    daily = sqlite_insert(DailySales).values(
+        day=order.created_at.date(),
+        orders=1,
+        units=units,
+        revenue=order.total
+    )
+    session.execute(daily.on_conflict_do_update(
+        index_elements=[DailySales.day],
+        set_={
+            "orders": DailySales.orders + daily.excluded.orders,
+            "units": DailySales.units + daily.excluded.units,
+            "revenue": DailySales.revenue + daily.excluded.revenue
+        }
+    ))
+
+    per_product = sqlite_insert(ProductSales)
+    session.execute(
+        per_product.on_conflict_do_update(
+            index_elements=[ProductSales.product_id],
+            set_={
+                "name": per_product.excluded.name,
+                "units": ProductSales.units + per_product.excluded.units,
+                "revenue": ProductSales.revenue + per_product.excluded.revenue
+            }
+        ),
+        [
+            {
+                "product_id": item.product_id,
+                "name": item.name,
+                "units": item.quantity,
+                "revenue": item.price * item.quantity
+            }
+            for item in order.items
+        ]
+    )
+
+def backfill_rollups():
+    """Build the rollups from existing orders if they have never been filled"""
+    with Session(engine) as session:
+        if session.exec(select(DailySales).limit(1)).first() is not None:
+            return
+        if session.exec(select(Order).limit(1)).first() is None:
+            return
+
+        session.execute(text("""
+            INSERT INTO dailysales (day, orders, units, revenue)
+            SELECT date(o.created_at), COUNT(*), SUM(u.units), SUM(o.total)
+            FROM "order" o
+            JOIN (SELECT order_id, SUM(quantity) AS units FROM orderitem GROUP BY order_id) u
+                ON u.order_id = o.id
+            GROUP BY date(o.created_at)
+        """))
+        session.execute(text("""
+            INSERT INTO productsales (product_id, name, units, revenue)
+            SELECT product_id, MAX(name), SUM(quantity), SUM(price * quantity)
+            FROM orderitem
+            GROUP BY product_id
+        """))
+        session.commit()
+
+def rollup_summary(session: Session, days: int = 30, top: int = 10) -> dict:
+    """Revenue per day and basket size over the last days, and all-time top products, from the rollup tables"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    daily = session.exec(
+        select(DailySales).where(DailySales.day >= since).order_by(DailySales.day)
+    ).all()
+    top_products = session.exec(
+        select(ProductSales).order_by(ProductSales.units.desc()).limit(top)
+    ).all()
+
+    orders = sum(row.orders for row in daily)
+    return {
+        "source": "rollup",
+        "revenue_per_day": [
+            {"day": row.day.isoformat(), "orders": row.orders, "units": row.units, "revenue": row.revenue}
+            for row in daily
+        ],
+        # ProductSales has no per-day breakdown, so these cover every order ever placed
+        "top_products_all_time": [
+            {"product_id": row.product_id, "name": row.name, "units": row.units, "revenue": row.revenue}
+            for row in top_products
+        ],
+        "average_basket": {
+            "revenue": sum(row.revenue for row in daily) / orders if orders else 0.0,
+            "units": sum(row.units for row in daily) / orders if orders else 0.0
+        }
+    }
+
+def window_summary(session: Session, start: datetime, end: datetime, top: int = 10) -> dict:
+    """Aggregate an arbitrary [start, end) window with NumPy over column snapshots"""
+    in_window = (Order.created_at >= start) & (Order.created_at < end)
+
+    # One row per order: creation time, total and units
+    order_rows = session.exec(
+        select(Order.created_at, Order.total, func.sum(OrderItem.quantity))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(in_window)
+        .group_by(Order.id)
+    ).all()
+    # One row per order line
+    item_rows = session.exec(
+        select(OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+        .join(Order, OrderItem.order_id == Order.id)
+        .where(in_window)
+    ).all()
+
+    first_day = start.date()
+    day_count = (end.date() - first_day).days + 1
+
+    if order_rows:
+        created, totals, units = zip(*order_rows)
+        totals = np.fromiter(totals, dtype=np.float64, count=len(order_rows))
+        units = np.fromiter(units, dtype=np.int64, count=len(order_rows))
+        day_index = np.fromiter(((c.date() - first_day).days for c in created), dtype=np.int64, count=len(order_rows))
+    else:
+        totals = np.zeros(0, dtype=np.float64)
+        units = np.zeros(0, dtype=np.int64)
+        day_index = np.zeros(0, dtype=np.int64)
+
+    orders_per_day = np.bincount(day_index, minlength=day_count)
+    units_per_day = np.bincount(day_index, weights=units, minlength=day_count)
+    revenue_per_day = np.bincount(day_index, weights=totals, minlength=day_count)
+
+    top_products = []
+    if item_rows:
+        product_ids, quantities, prices = (np.asarray(column) for column in zip(*item_rows))
+        unique_ids, inverse = np.unique(product_ids, return_inverse=True)
+        product_units = np.bincount(inverse, weights=quantities)
+        product_revenue = np.bincount(inverse, weights=quantities * prices)
+        for i in np.argsort(-product_units, kind="stable")[:top]:
+            top_products.append({
+                "product_id": int(unique_ids[i]),
+                "units": int(product_units[i]),
+                "revenue": float(product_revenue[i])
+            })
+
+    return {
+        "source": "window",
+        "revenue_per_day": [
+            {
+                "day": (first_day + timedelta(days=int(i))).isoformat(),
+                "orders": int(orders_per_day[i]),
+                "units": int(units_per_day[i]),
+                "revenue": float(revenue_per_day[i])
+            }
+            for i in np.flatnonzero(orders_per_day)
+        ],
+        "top_products": top_products,
+        "average_basket": {
+            "revenue": float(totals.mean()) if totals.size else 0.0,
+            "units": float(units.mean()) if units.size else 0.0
+        }
+    }
@@ -5,7 +5,8 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
 
 from models import User, UserResponse, TokenData
@@ -28,16 +29,16 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def get_user_by_username(session: Session, username: str) -> Optional[User]:
+async def get_user_by_username(session: AsyncSession, username: str) -> Optional[User]:
     statement = select(User).where(User.username == username)
-    return session.exec(statement).first()
+    return (await session.exec(statement)).first()
 
-def get_user_by_email(session: Session, email: str) -> Optional[User]:
+async def get_user_by_email(session: AsyncSession, email: str) -> Optional[User]:
     statement = select(User).where(User.email == email)
-    return session.exec(statement).first()
+    return (await session.exec(statement)).first()
 
-def authenticate_user(session: Session, username: str, password: str):
-    user = get_user_by_username(session, username)
+async def authenticate_user(session: AsyncSession, username: str, password: str):
+    user = await get_user_by_username(session, username)
     if not user:
         return False
     if not verify_password(password, user.password_hash):
@@ -56,7 +57,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -72,7 +73,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = get_user_by_username(session, username=token_data.username)
+    user = await get_user_by_username(session, username=token_data.username)
     if user is None:
         raise credentials_exception
     return user
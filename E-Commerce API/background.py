@@ -0,0 +1,16 @@
+#background.py
+
+import asyncio
+import logging
+from typing import Callable
+
+async def run_periodically(job: Callable[[], int], interval: int, description: str):
+    """Run a blocking cleanup job in a worker thread every interval seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await asyncio.to_thread(job)
+            if removed:
+                logging.info(f"Removed {removed} {description}")
+        except Exception:
+            logging.exception(f"Cleanup of {description} failed")
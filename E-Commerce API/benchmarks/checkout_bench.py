@@ -0,0 +1,211 @@
+#checkout_bench.py
+
+"""Drive add-to-cart and checkout with concurrent shoppers on a few hot products.
+
+Runs the app in-process through httpx's ASGI transport against a throwaway
+SQLite database, then checks the database for oversold or inconsistent stock.
+
+    python benchmarks/checkout_bench.py --shoppers 50 --rounds 20 --output results.json
+
+Exits with status 1 if any consistency check fails or a request returns 5xx.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from typing import Dict, List
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shoppers", type=int, default=50, help="concurrent simulated shoppers")
+    parser.add_argument("--rounds", type=int, default=20, help="add-then-checkout rounds per shopper")
+    parser.add_argument("--products", type=int, default=3, help="number of hot products")
+    parser.add_argument("--stock", type=int, default=200, help="initial stock of each product")
+    parser.add_argument("--max-quantity", type=int, default=3, help="largest quantity added per round")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--group-commit", action="store_true", help="run with CHECKOUT_GROUP_COMMIT=true")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    return parser.parse_args()
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], statuses: Counter) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000 if values else 0.0
+    }
+
+async def run(args) -> dict:
+    # Imported here so DATABASE_URL and the working directory are already set
+    import httpx
+    from sqlmodel import Session, select, func
+
+    from main import app
+    from database import engine
+    from auth import create_access_token, get_password_hash
+    from models import User, Product, Order, OrderItem, ProductSales, StockHold
+    from checkout import checkout_writer
+
+    await app.router.startup()
+
+    with Session(engine) as session:
+        products = [
+            Product(name=f"Hot product {i}", price=10.0 + i, stock=args.stock)
+            for i in range(args.products)
+        ]
+        password_hash = get_password_hash("benchmark")
+        shoppers = [
+            User(username=f"shopper{i}", email=f"shopper{i}@example.com", password_hash=password_hash)
+            for i in range(args.shoppers)
+        ]
+        session.add_all(products + shoppers)
+        session.commit()
+        product_ids = [product.id for product in products]
+        usernames = [user.username for user in shoppers]
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    placed_orders = 0
+
+    async def timed(client, name: str, method: str, url: str, headers: dict):
+        start = time.perf_counter()
+        response = await client.request(method, url, headers=headers)
+        latencies[name].append(time.perf_counter() - start)
+        statuses[name][response.status_code] += 1
+        return response
+
+    async def shopper(client, index: int, username: str):
+        nonlocal placed_orders
+        rng = random.Random(args.seed * 100003 + index)
+        token = create_access_token({"sub": username}, timedelta(hours=1))
+        headers = {"Authorization": f"Bearer {token}"}
+        for _ in range(args.rounds):
+            product_id = rng.choice(product_ids)
+            quantity = rng.randint(1, args.max_quantity)
+            added = await timed(
+                client, "add_to_cart", "POST",
+                f"/cart/add?product_id={product_id}&quantity={quantity}", headers
+            )
+            if added.status_code != 200:
+                continue
+            checkout = await timed(client, "checkout", "POST", "/cart/checkout", headers)
+            if checkout.status_code == 200:
+                placed_orders += 1
+            else:
+                # Leave nothing held so the next round starts from an empty cart
+                await timed(client, "clear_cart", "DELETE", "/cart/clear", headers)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(shopper(client, i, name) for i, name in enumerate(usernames)))
+        elapsed = time.perf_counter() - started
+
+    for task_name in ("hold_sweeper", "idempotency_sweeper", "checkout_writer"):
+        task = getattr(app.state, task_name, None)
+        if task is not None:
+            task.cancel()
+    await app.router.shutdown()
+
+    # Consistency checks against what the database ended up with
+    violations = []
+    per_product = []
+    with Session(engine) as session:
+        for product_id in product_ids:
+            stock = session.get(Product, product_id).stock
+            sold = session.exec(
+                select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.product_id == product_id)
+            ).one()
+            rollup = session.get(ProductSales, product_id)
+            rollup_units = rollup.units if rollup else 0
+            per_product.append({"product_id": product_id, "stock": stock, "sold": sold, "rollup_units": rollup_units})
+
+            if stock < 0:
+                violations.append(f"product {product_id}: negative stock {stock}")
+            if sold > args.stock:
+                violations.append(f"product {product_id}: oversold, {sold} sold of {args.stock}")
+            if args.stock - stock != sold:
+                violations.append(f"product {product_id}: stock fell by {args.stock - stock} but {sold} were ordered")
+            if rollup_units != sold:
+                violations.append(f"product {product_id}: sales rollup has {rollup_units} units, orders have {sold}")
+
+        order_count = session.exec(select(func.count()).select_from(Order)).one()
+        if order_count != placed_orders:
+            violations.append(f"{order_count} orders stored but {placed_orders} checkouts succeeded")
+        leftover_holds = session.exec(select(func.count()).select_from(StockHold)).one()
+        if leftover_holds:
+            violations.append(f"{leftover_holds} stock holds left after every cart was checked out or cleared")
+
+    server_errors = sum(
+        count for counter in statuses.values() for code, count in counter.items() if code >= 500
+    )
+    total_requests = sum(len(values) for values in latencies.values())
+    return {
+        "config": vars(args),
+        "elapsed_seconds": elapsed,
+        "requests": total_requests,
+        "requests_per_second": total_requests / elapsed if elapsed else 0.0,
+        "orders": placed_orders,
+        "orders_per_second": placed_orders / elapsed if elapsed else 0.0,
+        "server_errors": server_errors,
+        "group_commit": checkout_writer.stats(),
+        "operations": {name: summarize(latencies[name], statuses[name]) for name in latencies},
+        "products": per_product,
+        "violations": violations
+    }
+
+def main():
+    args = parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    # Throwaway database and working directory (app.log, orders.json) for the run
+    workdir = tempfile.mkdtemp(prefix="checkout-bench-")
+    # Always replace DATABASE_URL; the run seeds users and places orders
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DATABASE_ECHO"] = "false"
+    if args.group_commit:
+        os.environ["CHECKOUT_GROUP_COMMIT"] = "true"
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+    results = asyncio.run(run(args))
+
+    print(f"{results['requests']} requests in {results['elapsed_seconds']:.2f}s "
+          f"({results['requests_per_second']:.1f} req/s), {results['orders']} orders "
+          f"({results['orders_per_second']:.1f}/s)")
+    for name, summary in results["operations"].items():
+        print(f"  {name:12} n={summary['count']:<6} p50={summary['p50_ms']:.1f}ms "
+              f"p95={summary['p95_ms']:.1f}ms p99={summary['p99_ms']:.1f}ms statuses={summary['statuses']}")
+    for violation in results["violations"]:
+        print(f"VIOLATION: {violation}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if results["violations"] or results["server_errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#serialization_bench.py
+
+"""Compare product and cart response times with and without FAST_JSON.
+
+Each mode runs in its own process (FAST_JSON is read at import) against a
+throwaway database seeded with identical rows. Catalog requests are served
+from a warm cache, so the timings are dominated by serialization.
+
+    python benchmarks/serialization_bench.py --products 500 --page-size 100 --output results.json
+
+Exits with status 1 if the two modes return different response bodies.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from checkout_bench import API_DIR, percentile
+
+# Fixed timestamps so both modes return byte-identical bodies
+SEED_TIME = datetime(2024, 1, 1, 12, 0, 0, 123456)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=500, help="products in the catalog")
+    parser.add_argument("--page-size", type=int, default=100, help="limit for the product list requests")
+    parser.add_argument("--cart-lines", type=int, default=20, help="lines in the benchmark cart")
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per endpoint")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+async def measure(args) -> dict:
+    """Runs inside a worker process, with FAST_JSON already set"""
+    import httpx
+    from sqlmodel import Session
+
+    from main import app
+    from database import engine
+    from auth import create_access_token
+    from models import User, Product
+    from cart_store import CartLines, cart_store
+    from fast_json import FAST_JSON, orjson
+
+    await app.router.startup()
+
+    with Session(engine) as session:
+        session.add_all(
+            Product(
+                name=f"Product {i:05d}",
+                price=round(5 + i * 0.37, 2),
+                stock=100 + i,
+                description=f"Description of product {i} with a few more words in it",
+                created_at=SEED_TIME + timedelta(minutes=i),
+                updated_at=SEED_TIME + timedelta(minutes=i)
+            )
+            for i in range(args.products)
+        )
+        user = User(username="reader", email="reader@example.com", password_hash="-")
+        session.add(user)
+        session.commit()
+        user_id = user.id
+
+    cart = CartLines()
+    for i in range(1, args.cart_lines + 1):
+        cart.add(i, f"Product {i:05d}", round(5 + i * 0.37, 2), 1 + i % 3)
+    cart_store.save(user_id, cart)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'reader'}, timedelta(hours=1))}"}
+
+    endpoints = {
+        "product_list": f"/products/?limit={args.page_size}",
+        "product_detail": "/products/1",
+        "cart": "/cart/"
+    }
+    results = {"fast_json": FAST_JSON, "orjson": orjson is not None, "endpoints": {}, "bodies": {}}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name, url in endpoints.items():
+            # The first request fills the catalog cache
+            first = await client.get(url, headers=headers)
+            results["bodies"][name] = first.text
+
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url} returned {response.status_code}")
+            elapsed = time.perf_counter() - started
+
+            latencies.sort()
+            results["endpoints"][name] = {
+                "requests_per_second": args.requests / elapsed,
+                "mean_ms": sum(latencies) / len(latencies) * 1000,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000
+            }
+
+    for task_name in ("hold_sweeper", "idempotency_sweeper"):
+        task = getattr(app.state, task_name, None)
+        if task is not None:
+            task.cancel()
+    await app.router.shutdown()
+    return results
+
+def run_worker(args):
+    workdir = tempfile.mkdtemp(prefix="serialization-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DATABASE_ECHO"] = "false"
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+    print(json.dumps(asyncio.run(measure(args))))
+
+def run_mode(fast_json: bool) -> dict:
+    env = dict(os.environ, FAST_JSON="true" if fast_json else "false")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker"] + sys.argv[1:],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    args = parse_args()
+    if args.worker:
+        run_worker(args)
+        return
+
+    standard = run_mode(fast_json=False)
+    fast = run_mode(fast_json=True)
+
+    mismatched = [name for name in standard["bodies"] if standard["bodies"][name] != fast["bodies"][name]]
+    comparison = {}
+    print(f"orjson installed: {fast['orjson']}")
+    for name, before in standard["endpoints"].items():
+        after = fast["endpoints"][name]
+        speedup = before["mean_ms"] / after["mean_ms"] if after["mean_ms"] else 0.0
+        comparison[name] = {"standard": before, "fast_json": after, "speedup": speedup}
+        print(f"  {name:15} standard p50={before['p50_ms']:.2f}ms  fast p50={after['p50_ms']:.2f}ms  "
+              f"{before['requests_per_second']:.0f} -> {after['requests_per_second']:.0f} req/s ({speedup:.2f}x)")
+    for name in mismatched:
+        print(f"MISMATCH: {name} responses differ between modes")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "config": {k: v for k, v in vars(args).items() if k != "worker"},
+                "orjson": fast["orjson"],
+                "endpoints": comparison,
+                "mismatched": mismatched
+            }, f, indent=2)
+
+    if mismatched:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#cart_store.py
+
+import asyncio
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlmodel import Session, select, delete
+
+from models import CartItem, CartRecord
+from database import engine
+
+# "memory" keeps carts in this process; "sqlite" shares them between workers
+CART_BACKEND = os.getenv("CART_BACKEND", "memory")
+CART_TTL_SECONDS = int(os.getenv("CART_TTL_SECONDS", "86400"))
+CART_MAX_ENTRIES = int(os.getenv("CART_MAX_ENTRIES", "10000"))
+
+class CartLines:
+    """Cart keyed by product_id with a running total, so line updates are O(1)"""
+
+    def __init__(self):
+        self.items: Dict[int, CartItem] = {}
+        self.total = 0.0
+
+    def add(self, product_id: int, name: str, price: float, quantity: int) -> None:
+        item = self.items.get(product_id)
+        if item is None:
+            self.items[product_id] = CartItem(
+                product_id=product_id,
+                quantity=quantity,
+                name=name,
+                price=price
+            )
+            self.total += price * quantity
+        else:
+            # The line keeps the price it was first added at
+            item.quantity += quantity
+            self.total += item.price * quantity
+
+    def set_quantity(self, product_id: int, quantity: int) -> bool:
+        item = self.items.get(product_id)
+        if item is None:
+            return False
+        if quantity <= 0:
+            return self.remove(product_id)
+        self.total += item.price * (quantity - item.quantity)
+        item.quantity = quantity
+        return True
+
+    def remove(self, product_id: int) -> bool:
+        item = self.items.pop(product_id, None)
+        if item is None:
+            return False
+        # Reset once empty so float rounding does not accumulate
+        self.total = self.total - item.price * item.quantity if self.items else 0.0
+        return True
+
+    def to_dict(self) -> dict:
+        """Same shape as the Cart response model"""
+        return {"items": list(self.items.values()), "total": self.total}
+
+    def to_plain_dict(self) -> dict:
+        """to_dict with the items as plain dicts, ready for any JSON encoder"""
+        return {
+            "items": [item.model_dump() for item in self.items.values()],
+            "total": self.total
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_plain_dict())
+
+    @classmethod
+    def from_json(cls, data: str) -> "CartLines":
+        raw = json.loads(data)
+        cart = cls()
+        for item in raw["items"]:
+            cart.items[item["product_id"]] = CartItem(**item)
+        cart.total = raw["total"]
+        return cart
+
+class CartStore(ABC):
+    """Interface used by the cart router to load and save carts"""
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[CartLines]:
+        ...
+
+    @abstractmethod
+    def save(self, user_id: int, cart: CartLines) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, user_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        ...
+
+    # Used by request handlers; stores that block on I/O run these in a worker thread
+    async def get_async(self, user_id: int) -> Optional[CartLines]:
+        return self.get(user_id)
+
+    async def save_async(self, user_id: int, cart: CartLines) -> None:
+        self.save(user_id, cart)
+
+    async def delete_async(self, user_id: int) -> None:
+        self.delete(user_id)
+
+class MemoryCartStore(CartStore):
+    """Per-process LRU store; carts expire after ttl seconds without a save"""
+
+    def __init__(self, max_entries: int = CART_MAX_ENTRIES, ttl: int = CART_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._carts: "OrderedDict[int, tuple]" = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[CartLines]:
+        entry = self._carts.get(user_id)
+        if entry is None:
+            return None
+        expires_at, cart = entry
+        if expires_at < time.monotonic():
+            del self._carts[user_id]
+            return None
+        self._carts.move_to_end(user_id)
+        return cart
+
+    def save(self, user_id: int, cart: CartLines) -> None:
+        self._carts[user_id] = (time.monotonic() + self.ttl, cart)
+        self._carts.move_to_end(user_id)
+        # Evict the least recently used carts once over capacity
+        while len(self._carts) > self.max_entries:
+            self._carts.popitem(last=False)
+
+    def delete(self, user_id: int) -> None:
+        self._carts.pop(user_id, None)
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        expired = [user_id for user_id, (expires_at, _) in self._carts.items() if expires_at < now]
+        for user_id in expired:
+            del self._carts[user_id]
+        return len(expired)
+
+class SQLiteCartStore(CartStore):
+    """Cart store backed by the cartrecord table, shared by all workers"""
+
+    # Expired rows are purged at most this often from save()
+    PURGE_INTERVAL_SECONDS = 60
+
+    def __init__(self, ttl: int = CART_TTL_SECONDS):
+        self.ttl = ttl
+        self._last_purge = 0.0
+
+    def get(self, user_id: int) -> Optional[CartLines]:
+        with Session(engine) as session:
+            record = session.exec(
+                select(CartRecord).where(
+                    CartRecord.user_id == user_id,
+                    CartRecord.expires_at > datetime.utcnow()
+                )
+            ).first()
+            if record is None:
+                return None
+            return CartLines.from_json(record.data)
+
+    def save(self, user_id: int, cart: CartLines) -> None:
+        with Session(engine) as session:
+            session.merge(CartRecord(
+                user_id=user_id,
+                data=cart.to_json(),
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl)
+            ))
+            session.commit()
+
+        if time.monotonic() - self._last_purge > self.PURGE_INTERVAL_SECONDS:
+            self.purge_expired()
+
+    def delete(self, user_id: int) -> None:
+        with Session(engine) as session:
+            session.execute(delete(CartRecord).where(CartRecord.user_id == user_id))
+            session.commit()
+
+    async def get_async(self, user_id: int) -> Optional[CartLines]:
+        return await asyncio.to_thread(self.get, user_id)
+
+    async def save_async(self, user_id: int, cart: CartLines) -> None:
+        await asyncio.to_thread(self.save, user_id, cart)
+
+    async def delete_async(self, user_id: int) -> None:
+        await asyncio.to_thread(self.delete, user_id)
+
+    def purge_expired(self) -> int:
+        self._last_purge = time.monotonic()
+        with Session(engine) as session:
+            result = session.execute(delete(CartRecord).where(CartRecord.expires_at <= datetime.utcnow()))
+            session.commit()
+            return result.rowcount
+
+def create_cart_store(backend: str = CART_BACKEND) -> CartStore:
+    if backend == "memory":
+        return MemoryCartStore()
+    if backend == "sqlite":
+        return SQLiteCartStore()
+    raise ValueError(f"Unknown cart backend: {backend}")
+
+cart_store = create_cart_store()
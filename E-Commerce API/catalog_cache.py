@@ -0,0 +1,119 @@
+#catalog_cache.py
+
+import os
+import time
+import uuid
+from email.utils import formatdate
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+from fast_json import join_fragments
+
+CATALOG_CACHE_TTL_SECONDS = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024"))
+# Encoded product JSON kept for FAST_JSON responses, least recently used dropped first
+CATALOG_CACHE_MAX_FRAGMENTS = int(os.getenv("CATALOG_CACHE_MAX_FRAGMENTS", "10000"))
+
+class CatalogCache:
+    """Bounded LRU of product responses; cleared whenever the catalog changes"""
+
+    def __init__(
+        self,
+        max_entries: int = CATALOG_CACHE_MAX_ENTRIES,
+        ttl: int = CATALOG_CACHE_TTL_SECONDS,
+        max_fragments: int = CATALOG_CACHE_MAX_FRAGMENTS
+    ):
+        self.max_entries = max_entries
+        self.max_fragments = max_fragments
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Catalog version for conditional GETs; bumped on every invalidation
+        self.version = 0
+        self.last_modified = time.time()
+        self._instance = uuid.uuid4().hex[:8]
+        # Encoded JSON of each product response, shared by list pages and details
+        self._fragments: "OrderedDict[int, tuple]" = OrderedDict()
+
+    def _lookup(self, store: OrderedDict, key: Hashable) -> Optional[Any]:
+        entry = store.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del store[key]
+            return None
+        store.move_to_end(key)
+        return entry[1]
+
+    def _store(self, store: OrderedDict, key: Hashable, value: Any, limit: int) -> None:
+        store[key] = (time.monotonic() + self.ttl, value)
+        store.move_to_end(key)
+        while len(store) > limit:
+            store.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._lookup(self._entries, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._store(self._entries, key, value, self.max_entries)
+
+    def fragment(self, product) -> bytes:
+        """Encoded JSON for a ProductResponse, built once per catalog version"""
+        encoded = self._lookup(self._fragments, product.id)
+        if encoded is None:
+            encoded = product.model_dump_json().encode("utf-8")
+            self._store(self._fragments, product.id, encoded, self.max_fragments)
+        return encoded
+
+    def encoded_page(self, key: Hashable, products: List) -> bytes:
+        """Encoded JSON array of a cached page of products"""
+        encoded = self.get(("json", key))
+        if encoded is None:
+            encoded = join_fragments(self.fragment(product) for product in products)
+            self.set(("json", key), encoded)
+        return encoded
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+        self._fragments.clear()
+        self.invalidations += 1
+        self.version += 1
+        self.last_modified = time.time()
+
+    def etag(self) -> str:
+        """Weak ETag for the current catalog version.
+
+        The version is per process, so the ETag also names this process and
+        the current TTL window; a change made through another worker is then
+        picked up no later than cached entries would be. With the cache turned
+        off (a TTL of 0) the window is one second.
+        """
+        window = int(time.time() // self.ttl) if self.ttl > 0 else int(time.time())
+        return f'W/"{self._instance}-{self.version}-{window}"'
+
+    def last_modified_header(self) -> str:
+        return formatdate(self.last_modified, usegmt=True)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "fragments": len(self._fragments),
+            "max_entries": self.max_entries,
+            "max_fragments": self.max_fragments,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "version": self.version
+        }
+
+catalog_cache = CatalogCache()
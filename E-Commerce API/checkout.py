@@ -0,0 +1,225 @@
+#checkout.py
+
+import asyncio
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, update
+
+from models import CartItem, OrderItem, Product
+from database import engine
+from order_store import create_order
+from analytics import record_sale
+from cart_store import CartLines
+from idempotency import idempotency_cache
+from inventory import held_by_others, release_holds
+from stock_alerts import threshold_crossing
+
+# Queue checkouts to a single writer that commits them in batches
+CHECKOUT_GROUP_COMMIT = os.getenv("CHECKOUT_GROUP_COMMIT", "false").lower() == "true"
+# How long the writer waits for more checkouts after the first, and the batch cap
+GROUP_COMMIT_WINDOW_MS = int(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+
+# (response body, low-stock alerts to publish, whether the body is a stored replay)
+CheckoutOutcome = Tuple[dict, List[dict], bool]
+
+def reserve_stock(session: Session, items: List[CartItem], user_id: int) -> Tuple[List[OrderItem], List[dict]]:
+    """Decrement stock for each cart line inside the session's transaction.
+
+    Returns the order items and the low-stock alerts to publish once committed.
+    Raises without rolling back; the caller discards the transaction or savepoint.
+    """
+    # Load every product in the cart with a single IN query
+    product_ids = [item.product_id for item in items]
+    products = {
+        product.id: product
+        for product in session.exec(select(Product).where(Product.id.in_(product_ids)))
+    }
+
+    order_items = []
+    alerts = []
+    for item in items:
+        product = products.get(item.product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail=f"Product {item.name} not found")
+
+        # Conditional decrement so concurrent buyers cannot oversell; stock held
+        # in other shoppers' carts is not available to this order
+        updated = session.execute(
+            update(Product)
+            .where(
+                Product.id == item.product_id,
+                Product.stock - held_by_others(Product.id, user_id) >= item.quantity
+            )
+            .values(
+                stock=Product.stock - item.quantity,
+                low_stock=Product.stock - item.quantity < Product.low_stock_threshold
+            )
+            .returning(Product.stock, Product.low_stock_threshold)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if updated is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Insufficient stock for {product.name}"
+            )
+
+        order_items.append(OrderItem(
+            product_id=product.id,
+            quantity=item.quantity,
+            price=product.price,
+            name=product.name
+        ))
+
+        new_stock, threshold = updated
+        alert = threshold_crossing(
+            product.id, product.name, new_stock + item.quantity < threshold, new_stock, threshold
+        )
+        if alert:
+            alerts.append(alert)
+
+    return order_items, alerts
+
+def place_order(session: Session, user_id: int, cart: CartLines, idempotency_key: Optional[str]) -> Tuple[dict, List[dict]]:
+    """All of a checkout's writes, left uncommitted.
+
+    Raises HTTPException if a line cannot be filled, and IntegrityError if
+    another request already stored a response for the idempotency key.
+    """
+    # Reserve stock for every line; nothing is committed if any line fails
+    order_items, alerts = reserve_stock(session, list(cart.items.values()), user_id)
+
+    # Record the order in the same transaction as the stock updates
+    order = create_order(
+        session,
+        user_id=user_id,
+        items=order_items,
+        total=cart.total,
+        status="completed"
+    )
+    record_sale(session, order)
+
+    # The purchased stock no longer needs to be held
+    release_holds(session, user_id)
+
+    result = {
+        "message": "Order placed successfully",
+        "order_id": order.id,
+        "total": order.total
+    }
+    if idempotency_key:
+        idempotency_cache.record(session, user_id, idempotency_key, result)
+        # Surface a duplicate key now rather than at commit
+        session.flush()
+    return result, alerts
+
+def stored_outcome(session: Session, user_id: int, idempotency_key: Optional[str]) -> Optional[CheckoutOutcome]:
+    """The first attempt's response after a duplicate idempotency key, if it exists"""
+    stored = idempotency_cache.lookup(session, user_id, idempotency_key) if idempotency_key else None
+    if stored is None:
+        return None
+    return stored, [], True
+
+def commit_checkout(session: Session, user_id: int, cart: CartLines, idempotency_key: Optional[str]) -> CheckoutOutcome:
+    """Place the order in its own transaction"""
+    try:
+        result, alerts = place_order(session, user_id, cart, idempotency_key)
+        session.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key committed first; its order stands
+        session.rollback()
+        outcome = stored_outcome(session, user_id, idempotency_key)
+        if outcome is None:
+            raise
+        return outcome
+    return result, alerts, False
+
+class CheckoutWriter:
+    """Single writer that commits queued checkouts together.
+
+    Each checkout runs in its own SAVEPOINT, so one that fails is rolled back
+    without affecting the others, and the whole batch is made durable by one
+    COMMIT. A request's future is resolved only after that commit.
+    """
+
+    def __init__(self, window_ms: int = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.checkouts = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def submit(self, user_id: int, cart: CartLines, idempotency_key: Optional[str]) -> CheckoutOutcome:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((user_id, cart, idempotency_key), future))
+        return await future
+
+    async def run(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Collect whatever else arrives within the window
+            deadline = asyncio.get_running_loop().time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            jobs = [job for job, _ in batch]
+            try:
+                outcomes = await asyncio.to_thread(self._commit_batch, jobs)
+            except Exception as exc:
+                logging.exception("Group commit of %d checkouts failed", len(jobs))
+                outcomes = [exc] * len(jobs)
+
+            self.batches += 1
+            self.checkouts += len(jobs)
+            for (_, future), outcome in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+
+    def _commit_batch(self, jobs: list) -> list:
+        outcomes = []
+        with Session(engine) as session:
+            # Take the write lock up front. An explicit BEGIN also keeps pysqlite
+            # from treating the first SAVEPOINT as the outer transaction.
+            session.execute(text("BEGIN IMMEDIATE"))
+            for user_id, cart, idempotency_key in jobs:
+                savepoint = session.begin_nested()
+                try:
+                    result, alerts = place_order(session, user_id, cart, idempotency_key)
+                    savepoint.commit()
+                    outcomes.append((result, alerts, False))
+                except IntegrityError as exc:
+                    savepoint.rollback()
+                    # The first attempt may be earlier in this same batch
+                    outcomes.append(stored_outcome(session, user_id, idempotency_key) or exc)
+                except Exception as exc:
+                    savepoint.rollback()
+                    outcomes.append(exc)
+            session.commit()
+        return outcomes
+
+    def stats(self) -> dict:
+        return {
+            "enabled": CHECKOUT_GROUP_COMMIT,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "checkouts": self.checkouts,
+            "average_batch": self.checkouts / self.batches if self.batches else 0.0
+        }
+
+checkout_writer = CheckoutWriter()
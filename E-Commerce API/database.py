@@ -1,17 +1,58 @@
 #database.py
 
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy import inspect, text
 import os
 
+from models import DEFAULT_LOW_STOCK_THRESHOLD
+
 # SQLite database URL
-DATABASE_URL = "sqlite:///./ecommerce.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ecommerce.db")
+
+# Same database through aiosqlite, for request handlers
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# Log every statement unless DATABASE_ECHO=false (e.g. when benchmarking)
+DATABASE_ECHO = os.getenv("DATABASE_ECHO", "true").lower() != "false"
+
+# Create engine. SQLite connections are cheap to open, and a fixed-size pool
+# stalls the event loop once every connection is held by an in-flight request
+engine = create_engine(DATABASE_URL, echo=DATABASE_ECHO, poolclass=NullPool)
+
+# Request handlers await their queries here, so one request's I/O does not
+# block the others. Startup, sweepers and worker threads keep the sync engine.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=DATABASE_ECHO)
 
-# Create engine
-engine = create_engine(DATABASE_URL, echo=True)
+def add_low_stock_columns(conn):
+    """Add the low-stock columns to a product table created before they existed"""
+    columns = {column["name"] for column in inspect(conn).get_columns("product")}
+    if "low_stock_threshold" not in columns:
+        conn.execute(text(
+            "ALTER TABLE product ADD COLUMN low_stock_threshold INTEGER NOT NULL "
+            f"DEFAULT {DEFAULT_LOW_STOCK_THRESHOLD}"
+        ))
+    if "low_stock" not in columns:
+        conn.execute(text("ALTER TABLE product ADD COLUMN low_stock BOOLEAN NOT NULL DEFAULT 0"))
+        # Flag the rows already below their threshold; every write keeps it current after this
+        conn.execute(text("UPDATE product SET low_stock = stock < low_stock_threshold"))
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # create_all does not alter tables that already exist
+    with engine.begin() as conn:
+        add_low_stock_columns(conn)
+        # Replaced by ix_product_low_stock_watch
+        conn.execute(text("DROP INDEX IF EXISTS ix_product_stock_name"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_product_low_stock"))
+    # Nor does it add indexes defined since to existing tables
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
-def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+async def get_session():
+    # Objects stay readable after commit without a lazy reload, which async sessions cannot do
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
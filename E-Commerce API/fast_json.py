@@ -0,0 +1,33 @@
+#fast_json.py
+
+import json
+import os
+from typing import Any, Iterable
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    # Optional; the standard library encoder is used without it
+    orjson = None
+
+# Serve product and cart responses without response_model validation and encoding
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() == "true"
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def join_fragments(fragments: Iterable[bytes]) -> bytes:
+    """JSON array from already encoded elements"""
+    return b"[" + b",".join(fragments) + b"]"
+
+class FastJSONResponse(JSONResponse):
+    """Sends pre-encoded bytes as they are and encodes anything else with orjson when installed"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,89 @@
+#idempotency.py
+
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlmodel import Session, select, delete
+
+from models import IdempotencyRecord
+from database import engine
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_SWEEP_INTERVAL_SECONDS = int(os.getenv("IDEMPOTENCY_SWEEP_INTERVAL_SECONDS", "300"))
+
+class IdempotencyCache:
+    """Stored responses by (user_id, key): a bounded LRU in front of the idempotencyrecord table"""
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_CACHE_SIZE, ttl: int = IDEMPOTENCY_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def lookup(self, session: Session, user_id: int, key: str) -> Optional[dict]:
+        entry = self._entries.get((user_id, key))
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end((user_id, key))
+            return entry[1]
+
+        # Another worker may have handled the first attempt
+        record = session.exec(
+            select(IdempotencyRecord).where(
+                IdempotencyRecord.user_id == user_id,
+                IdempotencyRecord.key == key,
+                IdempotencyRecord.created_at > datetime.utcnow() - timedelta(seconds=self.ttl)
+            )
+        ).first()
+        if record is None:
+            return None
+        response = json.loads(record.response)
+        self.remember(user_id, key, response)
+        return response
+
+    def record(self, session: Session, user_id: int, key: str, response: dict) -> None:
+        """Add the response to the session so it commits together with the request's writes.
+
+        A plain INSERT is used so a concurrent request with the same key fails
+        its commit with IntegrityError instead of overwriting the first one.
+        """
+        # An expired record for the key may not have been purged yet
+        session.execute(
+            delete(IdempotencyRecord).where(
+                IdempotencyRecord.user_id == user_id,
+                IdempotencyRecord.key == key,
+                IdempotencyRecord.created_at <= datetime.utcnow() - timedelta(seconds=self.ttl)
+            )
+        )
+        session.add(IdempotencyRecord(
+            user_id=user_id,
+            key=key,
+            response=json.dumps(response),
+            created_at=datetime.utcnow()
+        ))
+
+    def remember(self, user_id: int, key: str, response: dict) -> None:
+        self._entries[(user_id, key)] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end((user_id, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        # Runs in a worker thread, so iterate over a snapshot of the entries
+        for cache_key, (expires_at, _) in list(self._entries.items()):
+            if expires_at <= now:
+                self._entries.pop(cache_key, None)
+        with Session(engine) as session:
+            result = session.execute(
+                delete(IdempotencyRecord).where(
+                    IdempotencyRecord.created_at <= datetime.utcnow() - timedelta(seconds=self.ttl)
+                )
+            )
+            session.commit()
+            return result.rowcount
+
+idempotency_cache = IdempotencyCache()
@@ -0,0 +1,72 @@
+#inventory.py
+
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import DateTime, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, delete, update, func
+
+from models import Product, StockHold
+from database import engine
+
+# How long a cart line holds stock after the shopper's last cart change
+HOLD_TTL_SECONDS = int(os.getenv("HOLD_TTL_SECONDS", "900"))
+HOLD_SWEEP_INTERVAL_SECONDS = int(os.getenv("HOLD_SWEEP_INTERVAL_SECONDS", "60"))
+
+def held_by_others(product_id, user_id: int, now: Optional[datetime] = None):
+    """SQL expression summing other shoppers' unexpired holds on a product"""
+    now = now or datetime.utcnow()
+    return select(func.coalesce(func.sum(StockHold.quantity), 0)).where(
+        StockHold.product_id == product_id,
+        StockHold.user_id != user_id,
+        StockHold.expires_at > now
+    ).scalar_subquery()
+
+def place_hold(session: Session, user_id: int, product_id: int, quantity: int) -> bool:
+    """Set the user's hold on a product to the quantity now in their cart.
+
+    The hold is written only if the product's stock less other shoppers' holds
+    covers it, checked in the same statement so two carts cannot both take the
+    last unit. Returns False if nothing was written.
+    """
+    # A negative hold would add stock back for every other shopper
+    if quantity <= 0:
+        raise ValueError(f"Hold quantity must be positive, got {quantity}")
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=HOLD_TTL_SECONDS)
+    # One row if the product can cover the quantity, none otherwise
+    available = select(
+        literal(user_id), literal(product_id), literal(quantity), literal(expires_at, DateTime())
+    ).where(
+        Product.id == product_id,
+        Product.stock - held_by_others(Product.id, user_id, now) >= quantity
+    )
+    statement = sqlite_insert(StockHold).from_select(
+        ["user_id", "product_id", "quantity", "expires_at"], available
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "product_id"],
+        set_={"quantity": statement.excluded.quantity, "expires_at": statement.excluded.expires_at}
+    )
+    return session.execute(statement).rowcount > 0
+
+def extend_holds(session: Session, user_id: int):
+    session.execute(
+        update(StockHold)
+        .where(StockHold.user_id == user_id)
+        .values(expires_at=datetime.utcnow() + timedelta(seconds=HOLD_TTL_SECONDS))
+    )
+
+def release_holds(session: Session, user_id: int, product_id: Optional[int] = None):
+    statement = delete(StockHold).where(StockHold.user_id == user_id)
+    if product_id is not None:
+        statement = statement.where(StockHold.product_id == product_id)
+    session.execute(statement)
+
+def purge_expired_holds() -> int:
+    with Session(engine) as session:
+        result = session.execute(delete(StockHold).where(StockHold.expires_at <= datetime.utcnow()))
+        session.commit()
+        return result.rowcount
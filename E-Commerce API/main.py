@@ -2,11 +2,20 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import uvicorn
 
-from database import create_db_and_tables
+from database import create_db_and_tables, async_engine
+from order_store import migrate_orders_json
+from analytics import backfill_rollups
+from product_search import create_product_search_index
+from background import run_periodically
+from inventory import purge_expired_holds, HOLD_SWEEP_INTERVAL_SECONDS
+from idempotency import idempotency_cache, IDEMPOTENCY_SWEEP_INTERVAL_SECONDS
+from checkout import CHECKOUT_GROUP_COMMIT, checkout_writer
 from middleware import response_time_middleware
-from routers import users, products, cart, admin
+from pagination import NEXT_CURSOR_HEADER
+from routers import users, products, cart, orders, admin
 
 app = FastAPI(title="E-Commerce API", version="1.0.0")
 
@@ -17,6 +26,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Response time middleware
@@ -26,11 +36,34 @@ app.middleware("http")(response_time_middleware)
 app.include_router(users.router)
 app.include_router(products.router)
 app.include_router(cart.router)
+app.include_router(orders.router)
 app.include_router(admin.router)  # Added admin router
 
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    create_product_search_index()
+    migrate_orders_json()
+    backfill_rollups()
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Release stock held by carts that went quiet
+    app.state.hold_sweeper = asyncio.create_task(
+        run_periodically(purge_expired_holds, HOLD_SWEEP_INTERVAL_SECONDS, "expired stock holds")
+    )
+    # Drop idempotency keys older than their TTL
+    app.state.idempotency_sweeper = asyncio.create_task(
+        run_periodically(idempotency_cache.purge_expired, IDEMPOTENCY_SWEEP_INTERVAL_SECONDS, "expired idempotency keys")
+    )
+    if CHECKOUT_GROUP_COMMIT:
+        # Single writer that commits queued checkouts in batches
+        app.state.checkout_writer = asyncio.create_task(checkout_writer.run())
+
+@app.on_event("shutdown")
+async def close_database():
+    # Close pooled aiosqlite connections so their threads exit
+    await async_engine.dispose()
 
 @app.get("/")
 async def root():
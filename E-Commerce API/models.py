@@ -1,15 +1,27 @@
-from sqlmodel import SQLModel, Field, Session, create_engine, select
+from sqlmodel import SQLModel, Field, Relationship, Session, create_engine, select
+from sqlalchemy import Index
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel, EmailStr
 import json
 
+# Stock level below which a product is on the low-stock watchlist, unless set per product
+DEFAULT_LOW_STOCK_THRESHOLD = 10
+
 class Product(SQLModel, table=True):
+    # Covering index for the low-stock watchlist (flag, stock, name, threshold, and the rowid id)
+    __table_args__ = (
+        Index("ix_product_low_stock_watch", "low_stock", "stock", "name", "low_stock_threshold"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
     price: float
     stock: int
     description: Optional[str] = None
+    low_stock_threshold: int = Field(default=DEFAULT_LOW_STOCK_THRESHOLD)
+    # stock < low_stock_threshold, kept up to date by every write that changes either
+    low_stock: bool = Field(default=False)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -18,12 +30,18 @@ class ProductCreate(SQLModel):
     price: float
     stock: int
     description: Optional[str] = None
+    low_stock_threshold: int = DEFAULT_LOW_STOCK_THRESHOLD
+
+class ProductImport(ProductCreate):
+    # Rows with an id update that product; rows without one are inserted
+    id: Optional[int] = None
 
 class ProductUpdate(SQLModel):
     name: Optional[str] = None
     price: Optional[float] = None
     stock: Optional[int] = None
     description: Optional[str] = None
+    low_stock_threshold: Optional[int] = None
 
 class ProductResponse(SQLModel):
     id: int
@@ -31,6 +49,7 @@ class ProductResponse(SQLModel):
     price: float
     stock: int
     description: Optional[str] = None
+    low_stock_threshold: int = DEFAULT_LOW_STOCK_THRESHOLD
     created_at: datetime
     updated_at: datetime
 
@@ -72,19 +91,74 @@ class Cart(SQLModel):
     items: List[CartItem] = []
     total: float = 0.0
 
-class OrderItem(SQLModel):
+class CartRecord(SQLModel, table=True):
+    user_id: int = Field(primary_key=True)
+    data: str
+    expires_at: datetime = Field(index=True)
+
+class StockHold(SQLModel, table=True):
+    # Covering index for summing the active holds on a product
+    __table_args__ = (Index("ix_stockhold_product_active", "product_id", "expires_at", "user_id", "quantity"),)
+
+    user_id: int = Field(primary_key=True)
+    product_id: int = Field(primary_key=True)
+    quantity: int
+    expires_at: datetime = Field(index=True)
+
+class IdempotencyRecord(SQLModel, table=True):
+    user_id: int = Field(primary_key=True)
+    key: str = Field(primary_key=True)
+    response: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class OrderItem(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    order_id: Optional[int] = Field(default=None, foreign_key="order.id", index=True)
     product_id: int
     quantity: int
     price: float
     name: str
+    order: Optional["Order"] = Relationship(back_populates="items")
 
-class Order(SQLModel):
-    id: Optional[int] = None
-    user_id: int
-    items: List[OrderItem]
+class Order(SQLModel, table=True):
+    # Order history is read newest-first, per user or across all users
+    __table_args__ = (
+        Index("ix_order_user_created", "user_id", "created_at"),
+        Index("ix_order_created", "created_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
     total: float
     status: str = "pending"
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    items: List[OrderItem] = Relationship(back_populates="order")
+
+class DailySales(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    orders: int = 0
+    units: int = 0
+    revenue: float = 0.0
+
+class ProductSales(SQLModel, table=True):
+    product_id: int = Field(primary_key=True)
+    name: str
+    units: int = Field(default=0, index=True)
+    revenue: float = 0.0
+
+class OrderItemResponse(SQLModel):
+    product_id: int
+    quantity: int
+    price: float
+    name: str
+
+class OrderResponse(SQLModel):
+    id: int
+    user_id: int
+    items: List[OrderItemResponse]
+    total: float
+    status: str
+    created_at: datetime
 
 class LoginRequest(SQLModel):
     username: str
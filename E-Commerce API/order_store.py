@@ -0,0 +1,130 @@
+#order_store.py
+
+import json
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from models import Order, OrderItem
+from database import engine
+from pagination import encode_cursor, decode_cursor
+
+# Legacy backup file written by checkout before orders moved into the database
+LEGACY_ORDERS_FILE = "orders.json"
+
+def create_order(session: Session, user_id: int, items: List[OrderItem], total: float, status: str = "completed") -> Order:
+    """Add an order to the session; the caller commits it with the stock changes"""
+    order = Order(user_id=user_id, total=total, status=status, items=items)
+    session.add(order)
+    # Flush so the database assigns the order id before commit
+    session.flush()
+    return order
+
+def list_orders(
+    session: Session,
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20
+) -> Tuple[List[Order], Optional[str]]:
+    """Newest-first page of orders and the cursor for the next page, if any"""
+    statement = select(Order).options(selectinload(Order.items))
+    if user_id is not None:
+        statement = statement.where(Order.user_id == user_id)
+    if status:
+        statement = statement.where(Order.status == status)
+    if created_from:
+        statement = statement.where(Order.created_at >= created_from)
+    if created_to:
+        statement = statement.where(Order.created_at < created_to)
+    if cursor:
+        last_created, last_id = decode_cursor(cursor, str, int)
+        try:
+            last_created = datetime.fromisoformat(last_created)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(
+            tuple_(Order.created_at, Order.id) < tuple_(last_created, last_id)
+        )
+
+    orders = session.exec(
+        statement.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit)
+    ).all()
+
+    next_cursor = None
+    if len(orders) == limit:
+        next_cursor = encode_cursor(orders[-1].created_at.isoformat(), orders[-1].id)
+    return orders, next_cursor
+
+def legacy_order(order_dict: dict, order_id: Optional[int]) -> Order:
+    return Order(
+        id=order_id,
+        user_id=order_dict["user_id"],
+        total=order_dict["total"],
+        status=order_dict.get("status", "completed"),
+        created_at=datetime.fromisoformat(order_dict["created_at"]),
+        items=[OrderItem(**item) for item in order_dict.get("items", [])]
+    )
+
+def migrate_orders_json(path: str = LEGACY_ORDERS_FILE) -> int:
+    """Import the legacy orders.json once, then rename it so it is not re-imported"""
+    if not os.path.exists(path):
+        return 0
+
+    try:
+        with open(path, "r") as f:
+            orders = json.load(f)
+    except json.JSONDecodeError as e:
+        # Leave the file where it is so it can be repaired and imported on the next start
+        logging.error(f"Could not read {path}, no orders imported: {e}")
+        return 0
+
+    imported = 0
+    seen_ids = set()
+    duplicates = []
+    with Session(engine) as session:
+        for order_dict in orders:
+            order_id = order_dict.get("id")
+            if order_id in seen_ids:
+                # The old checkout could reuse len(orders) + 1 as an id
+                logging.warning(f"Order id {order_id} appears more than once in {path}; importing the copy with a new id")
+                duplicates.append(order_dict)
+                continue
+            if order_id is not None:
+                seen_ids.add(order_id)
+                # Skip ids that already made it in on a previous partial run
+                if session.get(Order, order_id):
+                    continue
+
+            session.add(legacy_order(order_dict, order_id))
+            imported += 1
+
+        # Added last so their new ids cannot collide with ids still to be imported
+        session.flush()
+        for order_dict in duplicates:
+            session.add(legacy_order(order_dict, None))
+            imported += 1
+        session.commit()
+
+    os.replace(path, path + ".migrated")
+    return imported
+
+if __name__ == "__main__":
+    import sys
+
+    from database import create_db_and_tables
+
+    create_db_and_tables()
+    imported = migrate_orders_json()
+    if os.path.exists(LEGACY_ORDERS_FILE):
+        print(f"{LEGACY_ORDERS_FILE} could not be read; nothing was imported")
+        sys.exit(1)
+    print(f"Imported {imported} orders from {LEGACY_ORDERS_FILE}")
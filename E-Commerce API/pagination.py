@@ -0,0 +1,34 @@
+#pagination.py
+
+import base64
+import json
+from typing import Any, List
+
+from fastapi import HTTPException, status
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values: Any) -> str:
+    """Pack the sort key of the last row into an opaque, URL-safe cursor"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types: type) -> List[Any]:
+    """Unpack a cursor holding one value of each of the given types"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        values = None
+
+    if not isinstance(values, list) or len(values) != len(types) or not all(
+        # JSON true/false decode as bool, which isinstance also counts as int
+        isinstance(value, expected) and not isinstance(value, bool)
+        for value, expected in zip(values, types)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return values
@@ -0,0 +1,74 @@
+#product_search.py
+
+import re
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session, select
+
+from models import Product
+from database import engine
+
+# External-content FTS5 index over product.name and product.description;
+# the triggers keep it in sync with every write to the product table
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, description,
+        content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, description ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+# bm25 column weights: a match in the name counts more than one in the description
+SEARCH_QUERY = text("""
+    SELECT product.* FROM product_fts
+    JOIN product ON product.id = product_fts.rowid
+    WHERE product_fts MATCH :query
+    ORDER BY bm25(product_fts, 10.0, 1.0)
+    LIMIT :limit OFFSET :skip
+""")
+
+def create_product_search_index():
+    """Create the FTS table and triggers, indexing existing products the first time"""
+    is_new = not inspect(engine).has_table("product_fts")
+    with engine.begin() as conn:
+        for statement in SEARCH_INDEX_DDL:
+            conn.execute(text(statement))
+        if is_new:
+            conn.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+
+def build_match_query(q: str) -> str:
+    """Turn free text into an FTS5 query where every word must match as a prefix"""
+    terms = re.findall(r"\w+", q)
+    return " ".join(f'"{term}"*' for term in terms)
+
+def search_products(session: Session, q: str, skip: int = 0, limit: int = 20) -> List[Product]:
+    match_query = build_match_query(q)
+    if not match_query:
+        return []
+    statement = select(Product).from_statement(SEARCH_QUERY)
+    result = session.execute(statement, {"query": match_query, "limit": limit, "skip": skip})
+    return result.scalars().all()
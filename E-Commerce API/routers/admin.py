@@ -1,30 +1,251 @@
 #admin.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, File, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Iterator, List, Optional
+from datetime import datetime, timedelta, timezone
+import asyncio
+import csv
+import io
+import json
 
-from models import Product, ProductCreate, ProductUpdate, ProductResponse, User, UserResponse
-from database import get_session
+from models import Product, ProductCreate, ProductImport, ProductUpdate, ProductResponse, User, UserResponse, OrderResponse
+from database import get_session, engine, async_engine
 from auth import get_current_admin_user
+from catalog_cache import catalog_cache
+from order_store import list_orders
+from analytics import rollup_summary, window_summary
+from pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from stock_alerts import stock_alerts
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# Rows per transaction for bulk product import, and per query for export
+PRODUCT_BATCH_SIZE = 1000
+
+# Import errors reported back to the caller are capped at this many
+MAX_IMPORT_ERRORS = 100
+
+USER_EXPORT_BATCH_SIZE = 1000
+
+# Sorts after any character, so prefix <= value < prefix + this is a prefix match
+PREFIX_UPPER_BOUND = "\U0010ffff"
+
+PRODUCT_EXPORT_FIELDS = ["id", "name", "price", "stock", "description", "low_stock_threshold", "created_at", "updated_at"]
+
+# Idle interval after which the stock alert stream sends a keep-alive comment
+SSE_KEEPALIVE_SECONDS = 15
+
+def filter_users(
+    statement,
+    username_prefix: Optional[str] = None,
+    email_prefix: Optional[str] = None,
+    is_admin: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+):
+    # Prefixes are matched as ranges so the username/email indexes are used
+    # (LIKE 'x%' is case-insensitive in SQLite and cannot use them)
+    if username_prefix:
+        statement = statement.where(
+            User.username >= username_prefix, User.username < username_prefix + PREFIX_UPPER_BOUND
+        )
+    if email_prefix:
+        statement = statement.where(
+            User.email >= email_prefix, User.email < email_prefix + PREFIX_UPPER_BOUND
+        )
+    if is_admin is not None:
+        statement = statement.where(User.is_admin == is_admin)
+    if created_from:
+        statement = statement.where(User.created_at >= created_from)
+    if created_to:
+        statement = statement.where(User.created_at < created_to)
+    return statement
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; convert query values that carry an offset"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def low_stock_items(session: Session, limit: int) -> List[dict]:
+    """Products on the watchlist, lowest stock first, read from ix_product_low_stock_watch"""
+    rows = session.exec(
+        select(Product.id, Product.name, Product.stock, Product.low_stock_threshold)
+        .where(Product.low_stock == True)
+        .order_by(Product.stock)
+        .limit(limit)
+    ).all()
+    return [
+        {"id": p.id, "name": p.name, "stock": p.stock, "threshold": p.low_stock_threshold}
+        for p in rows
+    ]
+
+def read_import_rows(upload: UploadFile, format: str) -> Iterator[dict]:
+    """Yield raw rows one at a time from an uploaded CSV or NDJSON file"""
+    stream = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+    if format == "csv":
+        for row in csv.DictReader(stream):
+            # Empty CSV cells mean "not set" for optional fields like id and description
+            yield {key: value for key, value in row.items() if value != ""}
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+def upsert_products(session: Session, rows: List[dict]):
+    """Insert or update a batch of products with a single executemany"""
+    statement = sqlite_insert(Product)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Product.id],
+        set_={
+            "name": statement.excluded.name,
+            "price": statement.excluded.price,
+            "stock": statement.excluded.stock,
+            "description": statement.excluded.description,
+            "low_stock_threshold": statement.excluded.low_stock_threshold,
+            "low_stock": statement.excluded.low_stock,
+            "updated_at": statement.excluded.updated_at
+        }
+    )
+    session.execute(statement, rows)
+    session.commit()
+
+def import_product_file(upload: UploadFile, format: str) -> dict:
+    """Validate and upsert an uploaded product file, one committed batch at a time"""
+    processed = 0
+    errors = []
+    batch = []
+    now = datetime.utcnow()
+    
+    with Session(engine) as session:
+        try:
+            for line_number, raw in enumerate(read_import_rows(upload, format), start=1):
+                try:
+                    product = ProductImport.model_validate(raw)
+                except ValidationError as e:
+                    if len(errors) < MAX_IMPORT_ERRORS:
+                        errors.append({"line": line_number, "error": e.errors(include_url=False)})
+                    continue
+                
+                row = product.model_dump()
+                row["low_stock"] = product.stock < product.low_stock_threshold
+                row["created_at"] = now
+                row["updated_at"] = now
+                batch.append(row)
+                
+                if len(batch) >= PRODUCT_BATCH_SIZE:
+                    upsert_products(session, batch)
+                    processed += len(batch)
+                    batch = []
+        except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Could not parse upload after {processed} products: {e}"
+            )
+        
+        if batch:
+            upsert_products(session, batch)
+            processed += len(batch)
+    
+    return {"processed": processed, "errors": errors}
+
+def iter_products(batch_size: int = PRODUCT_BATCH_SIZE) -> Iterator[Product]:
+    """Walk the catalog by id in batches so only one batch is in memory"""
+    last_id = 0
+    with Session(engine) as session:
+        while True:
+            batch = session.exec(
+                select(Product).where(Product.id > last_id).order_by(Product.id).limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            yield from batch
+            last_id = batch[-1].id
+            session.expunge_all()
+
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
-    session: Session = Depends(get_session),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    limit: int = Query(100, gt=0, le=500),
+    username_prefix: Optional[str] = None,
+    email_prefix: Optional[str] = None,
+    is_admin: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
     admin_user: User = Depends(get_current_admin_user)
 ):
-    users = session.exec(select(User)).all()
+    statement = filter_users(
+        select(User), username_prefix, email_prefix, is_admin, created_from, created_to
+    )
+    
+    # Page in the order of the index the prefix filter uses, otherwise by id
+    if username_prefix:
+        sort_name, sort_column = "username", User.username
+    elif email_prefix:
+        sort_name, sort_column = "email", User.email
+    else:
+        sort_name, sort_column = "id", User.id
+    
+    if cursor:
+        cursor_sort, last_value = decode_cursor(cursor, str, (int, str))
+        if cursor_sort != sort_name:
+            raise HTTPException(status_code=400, detail="Cursor does not match these filters")
+        if not isinstance(last_value, int if sort_name == "id" else str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(sort_column > last_value)
+    
+    users = (await session.exec(statement.order_by(sort_column).limit(limit))).all()
+    
+    if len(users) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_name, getattr(users[-1], sort_name))
     return users
 
+@router.get("/users/export")
+async def export_users(
+    username_prefix: Optional[str] = None,
+    email_prefix: Optional[str] = None,
+    is_admin: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    admin_user: User = Depends(get_current_admin_user)
+):
+    def generate():
+        last_id = 0
+        with Session(engine) as session:
+            while True:
+                statement = filter_users(
+                    select(User), username_prefix, email_prefix, is_admin, created_from, created_to
+                )
+                batch = session.exec(
+                    statement.where(User.id > last_id).order_by(User.id).limit(USER_EXPORT_BATCH_SIZE)
+                ).all()
+                if not batch:
+                    break
+                for user in batch:
+                    yield UserResponse.model_validate(user).model_dump_json() + "\n"
+                last_id = batch[-1].id
+                session.expunge_all()
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=users.ndjson"}
+    )
+
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     admin_user: User = Depends(get_current_admin_user)
 ):
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -32,42 +253,175 @@ async def get_user(
 @router.delete("/users/{user_id}")
 async def delete_user(
     user_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     admin_user: User = Depends(get_current_admin_user)
 ):
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     if user.is_admin:
         raise HTTPException(status_code=400, detail="Cannot delete admin users")
     
-    session.delete(user)
-    session.commit()
+    await session.delete(user)
+    await session.commit()
     return {"message": "User deleted successfully"}
 
+@router.get("/orders", response_model=List[OrderResponse])
+async def get_all_orders(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    limit: int = Query(20, gt=0, le=100),
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+    admin_user: User = Depends(get_current_admin_user)
+):
+    orders, next_cursor = await session.run_sync(
+        list_orders,
+        user_id=user_id,
+        status=status,
+        created_from=created_from,
+        created_to=created_to,
+        cursor=cursor,
+        limit=limit
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return orders
+
+@router.get("/analytics")
+async def get_sales_analytics(
+    days: int = Query(30, gt=0, le=366),
+    start: Optional[datetime] = Query(None, description="Start of an ad-hoc window (inclusive)"),
+    end: Optional[datetime] = Query(None, description="End of an ad-hoc window (exclusive)"),
+    top: int = Query(10, gt=0, le=100),
+    session: AsyncSession = Depends(get_session),
+    admin_user: User = Depends(get_current_admin_user)
+):
+    # The last N days come straight from the rollups; other windows scan their orders
+    if start is None and end is None:
+        return await session.run_sync(rollup_summary, days=days, top=top)
+    
+    end = to_naive_utc(end) or datetime.utcnow()
+    start = to_naive_utc(start) or end - timedelta(days=days)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return await session.run_sync(window_summary, start, end, top=top)
+
 @router.get("/stats")
 async def get_admin_stats(
-    session: Session = Depends(get_session),
+    low_stock_limit: int = Query(50, gt=0, le=1000),
+    session: AsyncSession = Depends(get_session),
     admin_user: User = Depends(get_current_admin_user)
 ):
-    # Get total users
-    total_users = session.exec(select(User)).count()
-    
-    # Get total products
-    total_products = session.exec(select(Product)).count()
-    
-    # Get low stock products
-    low_stock_products = session.exec(
-        select(Product).where(Product.stock < 10)
-    ).all()
+    # Count in SQL instead of loading every row
+    total_users = (await session.exec(select(func.count()).select_from(User))).one()
+    total_products = (await session.exec(select(func.count()).select_from(Product))).one()
+    low_stock_count = (await session.exec(
+        select(func.count()).select_from(Product).where(Product.low_stock == True)
+    )).one()
     
     return {
         "total_users": total_users,
         "total_products": total_products,
-        "low_stock_products": len(low_stock_products),
-        "low_stock_items": [
-            {"id": p.id, "name": p.name, "stock": p.stock} 
-            for p in low_stock_products
-        ]
-    }
\ No newline at end of file
+        "low_stock_products": low_stock_count,
+        "low_stock_items": await session.run_sync(low_stock_items, low_stock_limit)
+    }
+
+@router.get("/low-stock")
+async def get_low_stock(
+    limit: int = Query(100, gt=0, le=1000),
+    session: AsyncSession = Depends(get_session),
+    admin_user: User = Depends(get_current_admin_user)
+):
+    return await session.run_sync(low_stock_items, limit)
+
+@router.get("/stock-alerts")
+async def stream_stock_alerts(
+    request: Request,
+    admin_user: User = Depends(get_current_admin_user)
+):
+    """Server-sent events: the current watchlist, then every threshold crossing"""
+    # Subscribe before reading the snapshot so no crossing falls between the two;
+    # one published during the read may then also be reflected in the snapshot
+    queue = stock_alerts.subscribe()
+    try:
+        # A short-lived session; the injected one would stay open for the whole stream
+        async with AsyncSession(async_engine) as session:
+            snapshot = await session.run_sync(low_stock_items, 1000)
+    except BaseException:
+        stock_alerts.unsubscribe(queue)
+        raise
+    
+    async def events():
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    alert = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {alert['type']}\ndata: {json.dumps(alert)}\n\n"
+        finally:
+            stock_alerts.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@router.get("/catalog-cache")
+async def get_catalog_cache_stats(admin_user: User = Depends(get_current_admin_user)):
+    return catalog_cache.stats()
+
+@router.post("/products/import")
+async def import_products(
+    file: UploadFile = File(...),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    admin_user: User = Depends(get_current_admin_user)
+):
+    try:
+        # Reading and validating a large feed in a worker thread keeps other requests served
+        return await asyncio.to_thread(import_product_file, file, format)
+    finally:
+        # Batches committed before a parse error are already in the catalog
+        catalog_cache.invalidate()
+
+@router.get("/products/export")
+async def export_products(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    admin_user: User = Depends(get_current_admin_user)
+):
+    def generate_ndjson():
+        for product in iter_products():
+            yield ProductResponse.model_validate(product).model_dump_json() + "\n"
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=PRODUCT_EXPORT_FIELDS)
+        writer.writeheader()
+        for count, product in enumerate(iter_products(), start=1):
+            writer.writerow(ProductResponse.model_validate(product).model_dump())
+            if count % PRODUCT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    if format == "csv":
+        return StreamingResponse(
+            generate_csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=products.csv"}
+        )
+    return StreamingResponse(
+        generate_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=products.ndjson"}
+    )
\ No newline at end of file
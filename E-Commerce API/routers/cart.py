@@ -1,166 +1,157 @@
 #cart.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from typing import Dict, List
-import json
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
 
-from models import Cart, CartItem, Order, OrderItem, User, Product
+from models import Cart, User, Product
 from database import get_session
 from auth import get_current_user
+from cart_store import CartLines, cart_store
+from catalog_cache import catalog_cache
+from idempotency import idempotency_cache
+from stock_alerts import stock_alerts
+from inventory import place_hold, extend_holds, release_holds
+from checkout import CHECKOUT_GROUP_COMMIT, checkout_writer, commit_checkout
+from fast_json import FAST_JSON, FastJSONResponse
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
-# In-memory cart storage (in production, use Redis or database)
-user_carts: Dict[int, Cart] = {}
+def cart_response(cart: CartLines):
+    # With FAST_JSON the Cart response model's validation and encoding are skipped
+    if FAST_JSON:
+        return FastJSONResponse(cart.to_plain_dict())
+    return cart.to_dict()
 
 @router.get("/", response_model=Cart)
 async def get_cart(current_user: User = Depends(get_current_user)):
-    cart = user_carts.get(current_user.id, Cart())
-    return cart
+    cart = await cart_store.get_async(current_user.id) or CartLines()
+    return cart_response(cart)
 
 @router.post("/add", response_model=Cart)
 async def add_to_cart(
     product_id: int,
-    quantity: int = 1,
-    session: Session = Depends(get_session),
+    quantity: int = Query(1, gt=0),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     # Get product from database
-    product = session.get(Product, product_id)
+    product = await session.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    if product.stock < quantity:
+    # Get or create user's cart
+    cart = await cart_store.get_async(current_user.id) or CartLines()
+    
+    # Hold the line's new quantity and keep the user's other holds alive. Stock
+    # held in other carts is not available, so the hold is refused if it does not fit.
+    line = cart.items.get(product_id)
+    new_quantity = quantity + (line.quantity if line else 0)
+    await session.run_sync(extend_holds, current_user.id)
+    if not await session.run_sync(place_hold, current_user.id, product_id, new_quantity):
         raise HTTPException(status_code=400, detail="Insufficient stock")
+    await session.commit()
     
-    # Get or create user's cart
-    cart = user_carts.get(current_user.id, Cart())
-    
-    # Check if product already in cart
-    item_index = None
-    for i, item in enumerate(cart.items):
-        if item.product_id == product_id:
-            item_index = i
-            break
-    
-    if item_index is not None:
-        # Update existing item
-        cart.items[item_index].quantity += quantity
-    else:
-        # Add new item
-        cart_item = CartItem(
-            product_id=product.id,
-            quantity=quantity,
-            name=product.name,
-            price=product.price
-        )
-        cart.items.append(cart_item)
-    
-    # Update total
-    cart.total = sum(item.price * item.quantity for item in cart.items)
+    # Add the line or increase its quantity; the total is updated incrementally
+    cart.add(product.id, product.name, product.price, quantity)
     
     # Save cart
-    user_carts[current_user.id] = cart
+    await cart_store.save_async(current_user.id, cart)
     
-    return cart
+    return cart_response(cart)
 
 @router.post("/checkout")
 async def checkout(
-    session: Session = Depends(get_session),
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    cart = user_carts.get(current_user.id)
+    # A retried request gets the stored result of the first attempt
+    if idempotency_key:
+        stored = await session.run_sync(idempotency_cache.lookup, current_user.id, idempotency_key)
+        if stored is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return stored
+    
+    cart = await cart_store.get_async(current_user.id)
     if not cart or not cart.items:
         raise HTTPException(status_code=400, detail="Cart is empty")
     
-    # Check stock and process order
-    order_items = []
-    for item in cart.items:
-        product = session.get(Product, item.product_id)
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.name} not found")
-        
-        if product.stock < item.quantity:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient stock for {product.name}"
-            )
-        
-        # Update product stock
-        product.stock -= item.quantity
-        session.add(product)
-        
-        # Create order item
-        order_item = OrderItem(
-            product_id=product.id,
-            quantity=item.quantity,
-            price=product.price,
-            name=product.name
-        )
-        order_items.append(order_item)
-    
-    # Create order
-    order = Order(
-        user_id=current_user.id,
-        items=order_items,
-        total=cart.total,
-        status="completed"
-    )
-    
-    # Save order to JSON file
-    try:
-        with open("orders.json", "r") as f:
-            orders = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        orders = []
-    
-    order_dict = {
-        "id": len(orders) + 1,
-        "user_id": order.user_id,
-        "items": [item.dict() for item in order.items],
-        "total": order.total,
-        "status": order.status,
-        "created_at": datetime.utcnow().isoformat()
-    }
-    
-    orders.append(order_dict)
-    
-    with open("orders.json", "w") as f:
-        json.dump(orders, f, indent=2)
+    if CHECKOUT_GROUP_COMMIT:
+        # Committed together with other checkouts by the single writer task
+        result, alerts, replayed = await checkout_writer.submit(current_user.id, cart, idempotency_key)
+    else:
+        result, alerts, replayed = await session.run_sync(commit_checkout, current_user.id, cart, idempotency_key)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+        return result
+    
+    if idempotency_key:
+        idempotency_cache.remember(current_user.id, idempotency_key, result)
+    
+    # Cached product responses carry the old stock levels
+    catalog_cache.invalidate()
+    for alert in alerts:
+        stock_alerts.publish(alert)
     
     # Clear cart
-    user_carts[current_user.id] = Cart()
+    await cart_store.delete_async(current_user.id)
+    
+    return result
+
+@router.put("/item/{product_id}", response_model=Cart)
+async def update_cart_item(
+    product_id: int,
+    quantity: int = Query(..., ge=0),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    cart = await cart_store.get_async(current_user.id)
+    if not cart or product_id not in cart.items:
+        raise HTTPException(status_code=404, detail="Item not in cart")
+    
+    await session.run_sync(extend_holds, current_user.id)
+    if quantity > 0:
+        if not await session.run_sync(place_hold, current_user.id, product_id, quantity):
+            raise HTTPException(status_code=400, detail="Insufficient stock")
+    else:
+        await session.run_sync(release_holds, current_user.id, product_id)
+    await session.commit()
     
-    session.commit()
+    # A quantity of 0 removes the line
+    cart.set_quantity(product_id, quantity)
+    await cart_store.save_async(current_user.id, cart)
     
-    return {
-        "message": "Order placed successfully",
-        "order_id": order_dict["id"],
-        "total": order.total
-    }
+    return cart_response(cart)
 
-@router.delete("/item/{product_id}")
+@router.delete("/item/{product_id}", response_model=Cart)
 async def remove_from_cart(
     product_id: int,
+    session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    cart = user_carts.get(current_user.id)
+    cart = await cart_store.get_async(current_user.id)
     if not cart:
         raise HTTPException(status_code=400, detail="Cart is empty")
     
-    # Find and remove item
-    cart.items = [item for item in cart.items if item.product_id != product_id]
+    await session.run_sync(extend_holds, current_user.id)
+    await session.run_sync(release_holds, current_user.id, product_id)
+    await session.commit()
     
-    # Update total
-    cart.total = sum(item.price * item.quantity for item in cart.items)
+    # Remove item; the total is updated incrementally
+    cart.remove(product_id)
     
-    user_carts[current_user.id] = cart
+    await cart_store.save_async(current_user.id, cart)
     
-    return cart
+    return cart_response(cart)
 
 @router.delete("/clear")
-async def clear_cart(current_user: User = Depends(get_current_user)):
-    user_carts[current_user.id] = Cart()
+async def clear_cart(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    await session.run_sync(release_holds, current_user.id)
+    await session.commit()
+    await cart_store.delete_async(current_user.id)
     return {"message": "Cart cleared successfully"}
\ No newline at end of file
@@ -0,0 +1,57 @@
+#orders.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+
+from models import Order, OrderResponse, User
+from database import get_session
+from auth import get_current_user
+from order_store import list_orders
+from pagination import NEXT_CURSOR_HEADER
+
+router = APIRouter(prefix="/orders", tags=["Orders"])
+
+@router.get("/", response_model=List[OrderResponse])
+async def get_my_orders(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    limit: int = Query(20, gt=0, le=100),
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    orders, next_cursor = await session.run_sync(
+        list_orders,
+        user_id=current_user.id,
+        status=status,
+        created_from=created_from,
+        created_to=created_to,
+        cursor=cursor,
+        limit=limit
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return orders
+
+@router.get("/{order_id}", response_model=OrderResponse)
+async def get_order(
+    order_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    order = (await session.exec(
+        select(Order).options(selectinload(Order.items)).where(Order.id == order_id)
+    )).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    if order.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to access this order")
+    
+    return order
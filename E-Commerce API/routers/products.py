@@ -1,73 +1,174 @@
 #products.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
 
 from models import Product, ProductCreate, ProductUpdate, ProductResponse, User
 from database import get_session
 from auth import get_current_user, get_current_admin_user
+from catalog_cache import catalog_cache
+from pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from product_search import search_products
+from stock_alerts import stock_alerts, threshold_crossing
+from fast_json import FAST_JSON, FastJSONResponse
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
+def check_not_modified(request: Request, response: Response) -> Optional[Response]:
+    """Return a 304 if the client's ETag matches the catalog version, else set the validators"""
+    headers = {
+        "ETag": catalog_cache.etag(),
+        "Last-Modified": catalog_cache.last_modified_header()
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in tags or headers["ETag"] in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
 @router.get("/", response_model=List[ProductResponse])
 async def get_products(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    session: Session = Depends(get_session)
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    order_by: str = Query("id", pattern="^(id|name)$"),
+    session: AsyncSession = Depends(get_session)
 ):
-    products = session.exec(select(Product).offset(skip).limit(limit)).all()
+    not_modified = check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
+    cache_key = ("list", skip, limit, cursor, order_by)
+    products = catalog_cache.get(cache_key)
+    if products is None:
+        if order_by == "name":
+            statement = select(Product).order_by(Product.name, Product.id)
+        else:
+            statement = select(Product).order_by(Product.id)
+        
+        if cursor:
+            # Seek past the last row of the previous page instead of skipping rows
+            if order_by == "name":
+                last_name, last_id = decode_cursor(cursor, str, int)
+                statement = statement.where(tuple_(Product.name, Product.id) > tuple_(last_name, last_id))
+            else:
+                last_id, = decode_cursor(cursor, int)
+                statement = statement.where(Product.id > last_id)
+        else:
+            statement = statement.offset(skip)
+        
+        rows = (await session.exec(statement.limit(limit))).all()
+        products = [ProductResponse.model_validate(row) for row in rows]
+        catalog_cache.set(cache_key, products)
+    
+    # A full page may have more rows after it
+    if products and len(products) == limit:
+        last = products[-1]
+        if order_by == "name":
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.name, last.id)
+        else:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.id)
+    
+    if FAST_JSON:
+        # Join the cached per-product JSON instead of validating and encoding every row
+        return FastJSONResponse(catalog_cache.encoded_page(cache_key, products), headers=response.headers)
     return products
 
+@router.get("/search", response_model=List[ProductResponse])
+async def search(
+    q: str = Query(..., min_length=1, description="Words to match in product names and descriptions"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, gt=0, le=100),
+    session: AsyncSession = Depends(get_session)
+):
+    # Ranked by BM25; every word matches as a prefix ("lap" finds "laptop")
+    return await session.run_sync(search_products, q, skip=skip, limit=limit)
+
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: int, session: Session = Depends(get_session)):
-    product = session.get(Product, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+async def get_product(
+    product_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session)
+):
+    not_modified = check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
+    cache_key = ("item", product_id)
+    product = catalog_cache.get(cache_key)
+    if product is None:
+        db_product = await session.get(Product, product_id)
+        if not db_product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        product = ProductResponse.model_validate(db_product)
+        catalog_cache.set(cache_key, product)
+    
+    if FAST_JSON:
+        return FastJSONResponse(catalog_cache.fragment(product), headers=response.headers)
     return product
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
     product: ProductCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     admin_user: User = Depends(get_current_admin_user)
 ):
     db_product = Product.model_validate(product)
+    db_product.low_stock = db_product.stock < db_product.low_stock_threshold
     session.add(db_product)
-    session.commit()
-    session.refresh(db_product)
+    await session.commit()
+    await session.refresh(db_product)
+    catalog_cache.invalidate()
     return db_product
 
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(
     product_id: int,
     product_data: ProductUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     admin_user: User = Depends(get_current_admin_user)
 ):
-    db_product = session.get(Product, product_id)
+    db_product = await session.get(Product, product_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    was_low = db_product.low_stock
     product_data_dict = product_data.model_dump(exclude_unset=True)
     for key, value in product_data_dict.items():
         setattr(db_product, key, value)
+    db_product.low_stock = db_product.stock < db_product.low_stock_threshold
     
     session.add(db_product)
-    session.commit()
-    session.refresh(db_product)
+    await session.commit()
+    await session.refresh(db_product)
+    catalog_cache.invalidate()
+    
+    alert = threshold_crossing(
+        db_product.id, db_product.name, was_low, db_product.stock, db_product.low_stock_threshold
+    )
+    if alert:
+        stock_alerts.publish(alert)
     return db_product
 
 @router.delete("/{product_id}")
 async def delete_product(
     product_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     admin_user: User = Depends(get_current_admin_user)
 ):
-    product = session.get(Product, product_id)
+    product = await session.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    session.delete(product)
-    session.commit()
+    await session.delete(product)
+    await session.commit()
+    catalog_cache.invalidate()
     return {"message": "Product deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,44 @@
+#stock_alerts.py
+
+import asyncio
+from typing import Set
+
+# Events kept for a subscriber that is not reading; the oldest is dropped first
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class StockAlertBroadcaster:
+    """Fans low-stock threshold crossings out to the connected SSE clients of this process"""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, event: dict) -> None:
+        """Must be called from the event loop thread"""
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+def threshold_crossing(product_id: int, name: str, was_low: bool, stock: int, threshold: int):
+    """The alert for a stock change, or None if it stayed on the same side of the threshold"""
+    is_low = stock < threshold
+    if was_low == is_low:
+        return None
+    return {
+        "type": "low_stock" if is_low else "restocked",
+        "product_id": product_id,
+        "name": name,
+        "stock": stock,
+        "threshold": threshold
+    }
+
+stock_alerts = StockAlertBroadcaster()
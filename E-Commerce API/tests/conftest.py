@@ -0,0 +1,7 @@
+#conftest.py
+
+import os
+import sys
+
+# The API modules import each other by top-level name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,56 @@
+#test_cart_store.py
+
+import random
+
+import pytest
+
+from cart_store import CartLines, CartStore, create_cart_store
+
+def lines_total(cart: CartLines) -> float:
+    return sum(item.price * item.quantity for item in cart.items.values())
+
+def test_add_keeps_the_price_the_line_was_added_at():
+    cart = CartLines()
+    cart.add(1, "Widget", 10.0, 1)
+    cart.add(1, "Widget", 20.0, 1)
+
+    assert cart.items[1].quantity == 2
+    assert cart.total == pytest.approx(20.0)
+
+    cart.add(2, "Gadget", 5.0, 1)
+    cart.remove(1)
+    assert cart.total == pytest.approx(5.0)
+
+def test_total_matches_lines_after_any_changes():
+    rng = random.Random(7)
+    cart = CartLines()
+    for _ in range(2000):
+        product_id = rng.randint(1, 8)
+        action = rng.random()
+        if action < 0.5:
+            # Prices change between adds, as they can in the catalog
+            cart.add(product_id, f"Product {product_id}", round(rng.uniform(1, 100), 2), rng.randint(1, 5))
+        elif action < 0.8:
+            cart.set_quantity(product_id, rng.randint(0, 5))
+        else:
+            cart.remove(product_id)
+        assert cart.total == pytest.approx(lines_total(cart))
+
+def test_json_round_trip_keeps_lines_and_total():
+    cart = CartLines()
+    cart.add(1, "Widget", 10.0, 2)
+    cart.add(2, "Gadget", 2.5, 4)
+
+    restored = CartLines.from_json(cart.to_json())
+    assert restored.to_plain_dict() == cart.to_plain_dict()
+
+def test_incomplete_store_fails_when_created():
+    class GetOnlyStore(CartStore):
+        def get(self, user_id):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnlyStore()
+
+    for backend in ("memory", "sqlite"):
+        assert isinstance(create_cart_store(backend), CartStore)
@@ -0,0 +1,235 @@
+#backup_journal.py
+
+import json
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, select, delete, insert
+
+try:
+    import fcntl
+except ImportError:
+    # Unavailable on Windows, where the locks only cover threads; run a single process there
+    fcntl = None
+
+from models import Note
+from database import engine
+
+# Full backup of every note; the format of the old notes.json dump
+SNAPSHOT_FILE = os.getenv("NOTES_SNAPSHOT_FILE", "notes.json")
+# One JSON line per create, update or delete since the snapshot
+JOURNAL_FILE = os.getenv("NOTES_JOURNAL_FILE", "notes.journal.ndjson")
+# The journal being folded into the snapshot; left behind only if compaction crashed
+COMPACTING_FILE = JOURNAL_FILE + ".compacting"
+JOURNAL_COMPACT_INTERVAL_SECONDS = int(os.getenv("JOURNAL_COMPACT_INTERVAL_SECONDS", "3600"))
+# Deletes this recent are carried into the new journal by compaction, so an older
+# copy of the note flushed late by another worker cannot bring it back
+DELETE_RETENTION_SECONDS = 600
+
+# Lock files shared by every process using the backup, e.g. several workers and the CLI
+JOURNAL_LOCK_FILE = JOURNAL_FILE + ".lock"
+SNAPSHOT_LOCK_FILE = SNAPSHOT_FILE + ".lock"
+
+# Appends and moving the journal aside must not interleave
+_journal_lock = threading.Lock()
+# One compaction or initial snapshot at a time
+_snapshot_lock = threading.Lock()
+
+@contextmanager
+def _exclusive(thread_lock: threading.Lock, path: str):
+    """Hold thread_lock in this process and an flock on path across processes"""
+    with thread_lock, open(path, "a") as lock_file:
+        if fcntl is not None:
+            # Released when the file is closed
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        yield
+
+def note_to_dict(note: Note) -> dict:
+    return {
+        "id": note.id,
+        "title": note.title,
+        "content": note.content,
+        "created_at": note.created_at.isoformat(),
+        "updated_at": note.updated_at.isoformat(),
+        "user_id": note.user_id
+    }
+
+def journal_entry(op: str, note: Note) -> dict:
+    """op is "upsert", which stores the whole note, or "delete" with the time of deletion"""
+    if op == "delete":
+        return {"op": "delete", "id": note.id, "at": datetime.utcnow().isoformat()}
+    return {"op": "upsert", "note": note_to_dict(note)}
+
+def entry_time(entry: dict) -> Optional[datetime]:
+    """When the change was made; None for deletes written before they were timestamped"""
+    at = entry.get("at") if entry["op"] == "delete" else entry["note"]["updated_at"]
+    return datetime.fromisoformat(at) if at else None
+
+def append_entries(entries: List[dict]):
+    """Append a batch of entries with a single write, then fsync"""
+    data = "".join(json.dumps(entry) + "\n" for entry in entries)
+    with _exclusive(_journal_lock, JOURNAL_LOCK_FILE):
+        with open(JOURNAL_FILE, "a") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+class BackupError(Exception):
+    """The snapshot cannot be read, so nothing may be rebuilt from it"""
+
+def read_snapshot(path: str = SNAPSHOT_FILE) -> Dict[int, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        try:
+            notes = json.load(f)
+        except json.JSONDecodeError as e:
+            # Unlike a torn journal line, this would drop every note in the snapshot
+            raise BackupError(f"{path} is not valid JSON: {e}")
+    return {note["id"]: note for note in notes}
+
+def replay_journal(notes: Dict[int, dict], path: str = JOURNAL_FILE, deleted: Optional[Dict[int, datetime]] = None) -> int:
+    """Apply the journal to a snapshot in place; returns the entries applied.
+
+    Each worker flushes on its own schedule, so an older version of a note can
+    come after a newer one; the newest change wins whatever the file order.
+    deleted collects deletion times and carries them across journal files.
+    """
+    if not os.path.exists(path):
+        return 0
+    if deleted is None:
+        deleted = {}
+    applied = 0
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash mid-append
+                continue
+
+            note_id = entry["id"] if entry["op"] == "delete" else entry["note"]["id"]
+            at = entry_time(entry)
+            versions = [deleted.get(note_id)]
+            if note_id in notes:
+                versions.append(datetime.fromisoformat(notes[note_id]["updated_at"]))
+            if at is not None and any(version is not None and version > at for version in versions):
+                continue
+
+            if entry["op"] == "delete":
+                notes.pop(note_id, None)
+                if at is not None:
+                    deleted[note_id] = at
+            else:
+                notes[note_id] = entry["note"]
+                # SQLite can reuse the id of the newest note after it is deleted
+                deleted.pop(note_id, None)
+            applied += 1
+    return applied
+
+def write_snapshot(notes: List[dict], path: str = SNAPSHOT_FILE):
+    # Write beside the target and rename, so a crash never leaves a partial snapshot
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(notes, f, indent=2, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def read_backup() -> Dict[int, dict]:
+    """Every note as of the last journal entry"""
+    # A compaction finishing midway could drop the entries it folded in
+    with _exclusive(_snapshot_lock, SNAPSHOT_LOCK_FILE):
+        notes = read_snapshot()
+        deleted = {}
+        replay_journal(notes, COMPACTING_FILE, deleted)
+        replay_journal(notes, JOURNAL_FILE, deleted)
+    return notes
+
+def compact_journal() -> int:
+    """Fold the journal into a new snapshot and start an empty journal"""
+    with _exclusive(_snapshot_lock, SNAPSHOT_LOCK_FILE):
+        # Raises before anything is moved if the snapshot is unreadable
+        notes = read_snapshot()
+        with _exclusive(_journal_lock, JOURNAL_LOCK_FILE):
+            # Every append holds this lock from opening the journal to closing it,
+            # so after the rename writers in any process start a new journal
+            if os.path.exists(JOURNAL_FILE) and not os.path.exists(COMPACTING_FILE):
+                os.replace(JOURNAL_FILE, COMPACTING_FILE)
+        if not os.path.exists(COMPACTING_FILE):
+            return 0
+
+        deleted = {}
+        applied = replay_journal(notes, COMPACTING_FILE, deleted)
+        write_snapshot(sorted(notes.values(), key=lambda note: note["id"]))
+        # The snapshot only holds notes, so keep recent deletes in the journal
+        cutoff = datetime.utcnow() - timedelta(seconds=DELETE_RETENTION_SECONDS)
+        recent = [
+            {"op": "delete", "id": note_id, "at": at.isoformat()}
+            for note_id, at in deleted.items() if at > cutoff
+        ]
+        if recent:
+            append_entries(recent)
+        os.remove(COMPACTING_FILE)
+        return applied
+
+def create_initial_snapshot():
+    """Snapshot the database once if there is no backup yet, e.g. right after upgrading"""
+    with _exclusive(_snapshot_lock, SNAPSHOT_LOCK_FILE):
+        if os.path.exists(JOURNAL_FILE) or os.path.exists(COMPACTING_FILE):
+            return
+        if os.path.exists(SNAPSHOT_FILE):
+            try:
+                read_snapshot()
+                return
+            except BackupError:
+                # Left by an older version that rewrote notes.json in place. With no
+                # journal yet the database is newer, so keep the file aside and start over.
+                os.replace(SNAPSHOT_FILE, SNAPSHOT_FILE + ".corrupt")
+                logging.warning(f"Moved unreadable {SNAPSHOT_FILE} to {SNAPSHOT_FILE}.corrupt")
+        with Session(engine) as session:
+            notes = session.exec(select(Note).order_by(Note.id)).all()
+            write_snapshot([note_to_dict(note) for note in notes])
+
+def restore_notes() -> int:
+    """Make the notes table match the snapshot plus journal"""
+    notes = read_backup()
+    with Session(engine) as session:
+        # Replace the table in one transaction; the backup has every note
+        session.execute(delete(Note))
+        if notes:
+            session.execute(
+                insert(Note),
+                [
+                    dict(
+                        note,
+                        created_at=datetime.fromisoformat(note["created_at"]),
+                        updated_at=datetime.fromisoformat(note["updated_at"])
+                    )
+                    for note in notes.values()
+                ]
+            )
+        session.commit()
+    return len(notes)
+
+if __name__ == "__main__":
+    from database import create_db_and_tables
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    try:
+        if command == "compact":
+            print(f"Compacted {compact_journal()} journal entries into {SNAPSHOT_FILE}")
+        elif command == "restore":
+            create_db_and_tables()
+            print(f"Restored {restore_notes()} notes from {SNAPSHOT_FILE} and {JOURNAL_FILE}")
+        else:
+            print("usage: python backup_journal.py compact|restore")
+            sys.exit(1)
+    except BackupError as e:
+        print(f"Nothing changed: {e}")
+        sys.exit(1)
@@ -0,0 +1,97 @@
+#backup_worker.py
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from models import Note
+from backup_journal import journal_entry, append_entries
+
+# How long changes wait in memory before they are written to the journal
+BACKUP_FLUSH_INTERVAL_SECONDS = float(os.getenv("BACKUP_FLUSH_INTERVAL_SECONDS", "1"))
+
+class BackupWorker:
+    """Writes note changes to the backup journal off the request path.
+
+    Handlers only queue a change in memory. The first change after a flush
+    starts the interval; every change made before it ends is written by one
+    append, and repeated changes to a note within it become a single entry.
+    """
+
+    def __init__(self, interval: float = BACKUP_FLUSH_INTERVAL_SECONDS):
+        self.interval = interval
+        self.flushes = 0
+        self.entries_written = 0
+        self.coalesced = 0
+        self.last_flush_at: Optional[datetime] = None
+        self.last_flush_entries = 0
+        # Latest change per note id, in the order notes were first changed
+        self._pending: Dict[int, dict] = {}
+        self._oldest_pending: Optional[float] = None
+        self._wakeup = asyncio.Event()
+        # The interval flush and the one at shutdown must not write at the same time
+        self._flush_lock = asyncio.Lock()
+
+    def enqueue(self, op: str, note: Note):
+        if note.id in self._pending:
+            self.coalesced += 1
+        else:
+            if not self._pending:
+                self._oldest_pending = time.monotonic()
+            self._wakeup.set()
+        self._pending[note.id] = journal_entry(op, note)
+
+    async def run(self):
+        while True:
+            await self._wakeup.wait()
+            # Let the rest of the burst arrive before writing
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                # The entries are queued again and retried next interval
+                logging.exception("Backup flush failed")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        if not self._pending:
+            self._wakeup.clear()
+            return 0
+        pending, oldest = self._pending, self._oldest_pending
+        self._pending, self._oldest_pending = {}, None
+        self._wakeup.clear()
+        try:
+            await asyncio.to_thread(append_entries, list(pending.values()))
+        except Exception:
+            # Changes made during the failed write are newer than these
+            pending.update(self._pending)
+            self._pending, self._oldest_pending = pending, oldest
+            self._wakeup.set()
+            raise
+
+        self.flushes += 1
+        self.entries_written += len(pending)
+        self.last_flush_at = datetime.utcnow()
+        self.last_flush_entries = len(pending)
+        return len(pending)
+
+    def status(self) -> dict:
+        lag = time.monotonic() - self._oldest_pending if self._oldest_pending is not None else 0.0
+        return {
+            "interval_seconds": self.interval,
+            "pending": len(self._pending),
+            "lag_seconds": round(lag, 3),
+            "last_flush_at": self.last_flush_at.isoformat() if self.last_flush_at else None,
+            "last_flush_entries": self.last_flush_entries,
+            "flushes": self.flushes,
+            "entries_written": self.entries_written,
+            "coalesced": self.coalesced
+        }
+
+backup_worker = BackupWorker()
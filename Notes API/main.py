@@ -2,10 +2,16 @@
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import uvicorn
 
 from database import create_db_and_tables
+from background import run_periodically
+from note_search import create_note_search_index
+from backup_journal import create_initial_snapshot, compact_journal, JOURNAL_COMPACT_INTERVAL_SECONDS
+from backup_worker import backup_worker
 from middleware import request_counter_middleware
+from pagination import NEXT_CURSOR_HEADER
 from routers import notes, auth
 
 app = FastAPI(title="Notes API", version="1.0.0")
@@ -20,6 +26,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Request counter middleware
@@ -32,6 +39,22 @@ app.include_router(notes.router)
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    create_note_search_index()
+    create_initial_snapshot()
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Fold the backup journal into a fresh snapshot
+    app.state.journal_compactor = asyncio.create_task(
+        run_periodically(compact_journal, JOURNAL_COMPACT_INTERVAL_SECONDS, "backup journal entries")
+    )
+    # Write queued note changes to the journal in batches
+    app.state.backup_worker = asyncio.create_task(backup_worker.run())
+
+@app.on_event("shutdown")
+async def flush_backup():
+    # Write whatever is still queued before exiting
+    await backup_worker.flush()
 
 @app.get("/")
 async def root():
@@ -49,5 +72,9 @@ async def get_stats():
         "message": "Check headers for request count and process time"
     }
 
+@app.get("/backup/status")
+async def backup_status():
+    return backup_worker.status()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
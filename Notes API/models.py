@@ -1,6 +1,7 @@
 #models.py
 
 from sqlmodel import SQLModel, Field, Session, create_engine, select
+from sqlalchemy import Index
 from typing import Optional, List
 from datetime import datetime
 from pydantic import BaseModel
@@ -13,6 +14,12 @@ class User(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Note(SQLModel, table=True):
+    # Newest-first listings of one user's notes are a range scan of one of these
+    __table_args__ = (
+        Index("ix_note_user_updated", "user_id", "updated_at", "id"),
+        Index("ix_note_user_created", "user_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     content: str
@@ -35,6 +42,24 @@ class NoteResponse(SQLModel):
     created_at: datetime
     updated_at: datetime
 
+class NoteListItem(SQLModel):
+    """A note in a listing; fields that were not selected are left out of the response"""
+    id: Optional[int] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    preview: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class NoteSearchResult(SQLModel):
+    id: int
+    title: str
+    title_highlight: str
+    snippet: str
+    rank: float
+    created_at: datetime
+    updated_at: datetime
+
 class UserCreate(SQLModel):
     username: str
     email: str
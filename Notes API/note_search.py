@@ -0,0 +1,90 @@
+#note_search.py
+
+import re
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session
+
+from database import engine
+
+# External-content FTS5 index over note.title and note.content; the triggers
+# keep it in sync with every write to the note table. user_id is indexed too
+# so a query is limited to one user's notes inside the index rather than after it.
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5(
+        title, content, user_id,
+        content='note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts(rowid, title, content, user_id)
+        VALUES (new.id, new.title, new.content, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content, user_id)
+        VALUES ('delete', old.id, old.title, old.content, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE OF title, content, user_id ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content, user_id)
+        VALUES ('delete', old.id, old.title, old.content, old.user_id);
+        INSERT INTO note_fts(rowid, title, content, user_id)
+        VALUES (new.id, new.title, new.content, new.user_id);
+    END
+    """,
+]
+
+# bm25 column weights: a match in the title counts more than one in the content,
+# and the user_id filter does not count at all. Lower bm25 is a better match.
+SEARCH_QUERY = text("""
+    SELECT note.id, note.title, note.created_at, note.updated_at,
+        highlight(note_fts, 0, :open, :close) AS title_highlight,
+        snippet(note_fts, 1, :open, :close, '…', 16) AS snippet,
+        bm25(note_fts, 10.0, 1.0, 0.0) AS rank
+    FROM note_fts
+    JOIN note ON note.id = note_fts.rowid
+    WHERE note_fts MATCH :query
+    ORDER BY rank
+    LIMIT :limit OFFSET :skip
+""")
+
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+
+def create_note_search_index():
+    """Create the FTS table and triggers, indexing existing notes the first time"""
+    is_new = not inspect(engine).has_table("note_fts")
+    with engine.begin() as conn:
+        for statement in SEARCH_INDEX_DDL:
+            conn.execute(text(statement))
+        if is_new:
+            conn.execute(text("INSERT INTO note_fts(note_fts) VALUES ('rebuild')"))
+
+def build_match_query(q: str, user_id: int) -> str:
+    """Turn free text into an FTS5 query for one user's notes where every word must match as a prefix"""
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return ""
+    words = " ".join(f'"{term}"*' for term in terms)
+    return f'user_id : "{user_id}" AND {{title content}} : ({words})'
+
+def search_notes(session: Session, user_id: int, q: str, skip: int = 0, limit: int = 20) -> List[dict]:
+    match_query = build_match_query(q, user_id)
+    if not match_query:
+        return []
+    result = session.execute(SEARCH_QUERY, {
+        "query": match_query,
+        "open": HIGHLIGHT_OPEN,
+        "close": HIGHLIGHT_CLOSE,
+        "limit": limit,
+        "skip": skip
+    })
+    return result.mappings().all()
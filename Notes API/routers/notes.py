@@ -1,33 +1,20 @@
 #notes.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlmodel import Session, select
-from typing import List
-import json
+from sqlalchemy import func, tuple_
+from typing import List, Optional
 from datetime import datetime
 
-from models import Note, NoteCreate, NoteUpdate, NoteResponse, User
+from models import Note, NoteCreate, NoteUpdate, NoteResponse, NoteListItem, NoteSearchResult, User
 from database import get_session
 from auth import get_current_user
+from backup_worker import backup_worker
+from note_search import search_notes
+from pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/notes", tags=["Notes"])
 
-def save_notes_to_json(notes: List[Note]):
-    """Save all notes to JSON file for backup"""
-    notes_data = []
-    for note in notes:
-        notes_data.append({
-            "id": note.id,
-            "title": note.title,
-            "content": note.content,
-            "created_at": note.created_at.isoformat(),
-            "updated_at": note.updated_at.isoformat(),
-            "user_id": note.user_id
-        })
-    
-    with open("notes.json", "w") as f:
-        json.dump(notes_data, f, indent=2, default=str)
-
 @router.post("/", response_model=NoteResponse, status_code=status.HTTP_201_CREATED)
 async def create_note(
     note: NoteCreate,
@@ -44,25 +31,95 @@ async def create_note(
     session.commit()
     session.refresh(db_note)
     
-    # Update backup file
-    all_notes = session.exec(select(Note)).all()
-    save_notes_to_json(all_notes)
+    # Queue the change for the backup journal
+    backup_worker.enqueue("upsert", db_note)
     
     return db_note
 
-@router.get("/", response_model=List[NoteResponse])
+# Column each sort option orders by, newest first
+SORT_COLUMNS = {"updated": Note.updated_at, "created": Note.created_at}
+
+# Characters of content in a summary's preview
+NOTE_PREVIEW_LENGTH = 200
+
+# What each listing field reads; preview is truncated by SQLite, so the full content is never loaded
+LIST_FIELDS = {
+    "id": Note.id,
+    "title": Note.title,
+    "content": Note.content,
+    "preview": func.substr(Note.content, 1, NOTE_PREVIEW_LENGTH).label("preview"),
+    "created_at": Note.created_at,
+    "updated_at": Note.updated_at
+}
+VIEW_FIELDS = {
+    "full": ["id", "title", "content", "created_at", "updated_at"],
+    "summary": ["id", "title", "preview", "created_at", "updated_at"]
+}
+
+def parse_fields(fields: Optional[str], view: str) -> List[str]:
+    names = list(dict.fromkeys(name.strip() for name in (fields or "").split(",") if name.strip()))
+    unknown = [name for name in names if name not in LIST_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}; choose from {', '.join(LIST_FIELDS)}"
+        )
+    return names or VIEW_FIELDS[view]
+
+@router.get("/", response_model=List[NoteListItem], response_model_exclude_unset=True)
 async def read_notes(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    sort: str = Query("updated", pattern="^(updated|created)$"),
+    view: str = Query("full", pattern="^(full|summary)$", description="summary returns a preview instead of the content"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return instead of a view, e.g. id,title,updated_at"),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    statement = select(Note).where(
+    sort_column = SORT_COLUMNS[sort]
+    names = parse_fields(fields, view)
+    # The id and sort column are always read for the next cursor
+    columns = {name: LIST_FIELDS[name] for name in names}
+    columns.setdefault("id", Note.id)
+    columns.setdefault(sort_column.key, sort_column)
+    
+    statement = select(*columns.values()).where(
         Note.user_id == current_user.id
-    ).offset(skip).limit(limit)
-    
-    notes = session.exec(statement).all()
-    return notes
+    ).order_by(sort_column.desc(), Note.id.desc())
+    
+    if cursor:
+        # Seek past the last row of the previous page instead of skipping rows
+        cursor_sort, last_value, last_id = decode_cursor(cursor, str, str, int)
+        try:
+            last_value = datetime.fromisoformat(last_value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if cursor_sort != sort:
+            raise HTTPException(status_code=400, detail="Cursor does not match this sort")
+        statement = statement.where(tuple_(sort_column, Note.id) < tuple_(last_value, last_id))
+    else:
+        statement = statement.offset(skip)
+    
+    rows = session.exec(statement.limit(limit)).mappings().all()
+    
+    # A full page may have more rows after it
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort, last[sort_column.key].isoformat(), last["id"])
+    return [NoteListItem(**{name: row[name] for name in names}) for row in rows]
+
+@router.get("/search", response_model=List[NoteSearchResult])
+async def search(
+    q: str = Query(..., min_length=1, description="Words to match in note titles and content"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, gt=0, le=100),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    # Ranked by BM25 with matches highlighted; every word matches as a prefix ("meet" finds "meeting")
+    return search_notes(session, current_user.id, q, skip=skip, limit=limit)
 
 @router.get("/{note_id}", response_model=NoteResponse)
 async def read_note(
@@ -103,9 +160,8 @@ async def update_note(
     session.commit()
     session.refresh(note)
     
-    # Update backup file
-    all_notes = session.exec(select(Note)).all()
-    save_notes_to_json(all_notes)
+    # Queue the change for the backup journal
+    backup_worker.enqueue("upsert", note)
     
     return note
 
@@ -125,8 +181,7 @@ async def delete_note(
     session.delete(note)
     session.commit()
     
-    # Update backup file
-    all_notes = session.exec(select(Note)).all()
-    save_notes_to_json(all_notes)
+    # Queue the change for the backup journal
+    backup_worker.enqueue("delete", note)
     
     return {"message": "Note deleted successfully"}
\ No newline at end of file